@@ -0,0 +1,7 @@
+"""
+Benchmarks hors ligne du gestionnaire (aucun accès Dropbox)
+
+    python -m benchmarks.crypto_bench --output results.json
+    python -m benchmarks.engines
+    python -m benchmarks.storage_bench --entries 10000
+"""
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Outils partagés des benchmarks : données synthétiques et métadonnées
+"""
+
+import datetime
+import json
+import os
+import platform
+import time
+from crypto import PasswordCrypto
+from kdf import PBKDF2KDF
+
+def make_entry(note_size):
+    """Entrée synthétique au format des front-ends"""
+    return json.dumps({
+        'username': 'user@example.com',
+        'password': 'Xk9!mQ2#vL7$pR4&',
+        'notes': 'n' * note_size
+    })
+
+def fast_crypto(engine=None):
+    """PasswordCrypto avec un KDF trivial : seul le chiffrement est mesuré"""
+    return PasswordCrypto("benchmark", PBKDF2KDF(os.urandom(16), iterations=1), engine=engine)
+
+def make_vault(crypto, entries, note_size):
+    """Coffre synthétique {compte: entrée chiffrée}"""
+    plaintext = make_entry(note_size)
+    return {f"account-{i:06d}": crypto.encrypt(plaintext, f"account-{i:06d}") for i in range(entries)}
+
+def timed(fn, *args, **kwargs):
+    """Exécute fn ; retourne (résultat, secondes)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_metadata():
+    """Contexte de la mesure, pour comparer des runs entre machines"""
+    try:
+        from importlib.metadata import version
+        cryptography_version = version('cryptography')
+    except Exception:
+        cryptography_version = None
+    
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'cryptography': cryptography_version
+    }
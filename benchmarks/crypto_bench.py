@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de PasswordCrypto selon la taille du coffre
+
+    python -m benchmarks.crypto_bench --output results.json
+    python -m benchmarks.crypto_bench --quick --compare results.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from crypto import PasswordCrypto
+from kdf import legacy_kdf, new_kdf
+from benchmarks.common import fast_crypto, make_entry, make_vault, run_metadata, timed
+
+VAULT_SIZES = [10, 1000, 10000, 100000]
+NOTE_SIZES = [0, 256, 4096]
+QUICK_VAULT_SIZES = [10, 1000]
+QUICK_NOTE_SIZES = [0, 256]
+
+def bench_create_fernet(repeat):
+    """Coût de _create_fernet (dérivation de clé) : KDF historique et KDF par défaut"""
+    results = []
+    for label, kdf in (('legacy', legacy_kdf()), ('default', new_kdf())):
+        samples = [timed(PasswordCrypto, "benchmark", kdf)[1] for _ in range(repeat)]
+        results.append({
+            'bench': 'create_fernet',
+            'kdf': label,
+            'params': kdf.cost_params(),
+            'median_ms': round(statistics.median(samples) * 1000, 3)
+        })
+    return results
+
+def bench_single(crypto, note_size, repeat):
+    """encrypt/decrypt d'une entrée isolée (médiane en µs)"""
+    plaintext = make_entry(note_size)
+    ciphertext = crypto.encrypt(plaintext, "account")
+    encrypt = [timed(crypto.encrypt, plaintext, "account")[1] for _ in range(repeat)]
+    decrypt = [timed(crypto.decrypt, ciphertext, "account")[1] for _ in range(repeat)]
+    return [
+        {'bench': 'encrypt', 'note_size': note_size, 'median_us': round(statistics.median(encrypt) * 1e6, 2)},
+        {'bench': 'decrypt', 'note_size': note_size, 'median_us': round(statistics.median(decrypt) * 1e6, 2)}
+    ]
+
+def bench_vault(crypto, entries, note_size):
+    """Déchiffrement complet d'un coffre : boucle séquentielle et decrypt_many"""
+    vault, build_s = timed(make_vault, crypto, entries, note_size)
+    vault_bytes = len(json.dumps({'passwords': vault}, indent=2, ensure_ascii=False).encode('utf-8'))
+    
+    _, sequential_s = timed(lambda: [crypto.decrypt(c, a) for a, c in vault.items()])
+    (results, errors), batch_s = timed(crypto.decrypt_many, vault, bind_keys=True)
+    assert not errors and len(results) == entries
+    
+    return {
+        'bench': 'full_vault_decrypt',
+        'entries': entries,
+        'note_size': note_size,
+        'vault_bytes': vault_bytes,
+        'build_s': round(build_s, 4),
+        'sequential_s': round(sequential_s, 4),
+        'decrypt_many_s': round(batch_s, 4),
+        'entries_per_s': round(entries / batch_s)
+    }
+
+def bench_stream(crypto, size_mb):
+    """Chiffrement/déchiffrement en flux d'un fichier : débit et pic mémoire"""
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, 'plain.bin')
+        sealed_path = os.path.join(tmp, 'sealed.bin')
+        with open(plain_path, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+        
+        tracemalloc.start()
+        with open(plain_path, 'rb') as src, open(sealed_path, 'wb') as dst:
+            _, encrypt_s = timed(crypto.encrypt_stream, src, dst)
+        with open(sealed_path, 'rb') as src, open(os.devnull, 'wb') as dst:
+            _, decrypt_s = timed(crypto.decrypt_stream, src, dst)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    
+    return {
+        'bench': 'stream',
+        'size_mb': size_mb,
+        'encrypt_mb_s': round(size_mb / encrypt_s, 1),
+        'decrypt_mb_s': round(size_mb / decrypt_s, 1),
+        'peak_kib': round(peak / 1024)
+    }
+
+def run(vault_sizes, note_sizes, engine=None, repeat=200, kdf_repeat=3, stream_mb=16):
+    """Lance la suite complète ; retourne le document JSON"""
+    crypto = fast_crypto(engine)
+    results = bench_create_fernet(kdf_repeat)
+    results.append(bench_stream(crypto, stream_mb))
+    
+    for note_size in note_sizes:
+        results.extend(bench_single(crypto, note_size, repeat))
+    
+    for entries in vault_sizes:
+        for note_size in note_sizes:
+            print(f"⏱️  full vault: {entries} entries, notes {note_size} B", file=sys.stderr)
+            results.append(bench_vault(crypto, entries, note_size))
+    
+    return {
+        'meta': {
+            **run_metadata(),
+            'engine': crypto.engine,
+            'batch_workers': crypto.batch_workers,
+            'batch_executor': crypto.batch_executor
+        },
+        'results': results
+    }
+
+def result_key(result):
+    """Identifiant stable d'une mesure, pour comparer deux runs"""
+    return tuple((k, str(v)) for k, v in sorted(result.items()) if k in ('bench', 'kdf', 'entries', 'note_size', 'size_mb'))
+
+def compare(baseline, current):
+    """Affiche le ratio courant/référence de chaque mesure commune"""
+    reference = {result_key(r): r for r in baseline['results']}
+    for result in current['results']:
+        base = reference.get(result_key(result))
+        if not base:
+            continue
+        metric = next(k for k in ('median_ms', 'median_us', 'decrypt_many_s', 'encrypt_mb_s') if k in result)
+        ratio = result[metric] / base[metric] if base[metric] else float('inf')
+        label = " ".join(f"{k}={v}" for k, v in result_key(result))
+        print(f"{label:<55} {metric:<15} {base[metric]:>10} -> {result[metric]:>10}  x{ratio:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de PasswordCrypto (hors ligne)")
+    parser.add_argument('--sizes', help="Tailles de coffre, séparées par des virgules")
+    parser.add_argument('--note-sizes', help="Tailles de notes en octets, séparées par des virgules")
+    parser.add_argument('--engine', help="Moteur de chiffrement (fernet, aesgcm, chacha20)")
+    parser.add_argument('--quick', action='store_true', help="Tailles réduites")
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    parser.add_argument('--compare', help="Résultats de référence à comparer")
+    args = parser.parse_args()
+    
+    vault_sizes = [int(n) for n in args.sizes.split(',')] if args.sizes else (QUICK_VAULT_SIZES if args.quick else VAULT_SIZES)
+    note_sizes = [int(n) for n in args.note_sizes.split(',')] if args.note_sizes else (QUICK_NOTE_SIZES if args.quick else NOTE_SIZES)
+    
+    report = run(vault_sizes, note_sizes, engine=args.engine, stream_mb=4 if args.quick else 64)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), report)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark des moteurs de chiffrement : débit et taille par entrée
+
+    python -m benchmarks.engines --entries 5000
+"""
+
+import argparse
+import json
+from crypto import ENGINES
+from benchmarks.common import fast_crypto, make_entry, timed
+
+def bench_engine(engine, entries, note_size):
+    """Mesure chiffrement/déchiffrement d'un lot pour un moteur"""
+    crypto = fast_crypto(engine)
+    plaintext = make_entry(note_size)
+    accounts = [f"account-{i}" for i in range(entries)]
+    
+    ciphertexts, encrypt_s = timed(lambda: [crypto.encrypt(plaintext, account) for account in accounts])
+    _, decrypt_s = timed(lambda: [crypto.decrypt(c, a) for a, c in zip(accounts, ciphertexts)])
+    
+    stored = sum(len(c) for c in ciphertexts) / entries
+    payload_mb = len(plaintext) * entries / (1024 * 1024)
+    return {
+        'engine': engine,
+        'entries': entries,
+        'plaintext_bytes': len(plaintext),
+        'stored_bytes': round(stored, 1),
+        'overhead_bytes': round(stored - len(plaintext), 1),
+        'encrypt_ops_s': round(entries / encrypt_s),
+        'decrypt_ops_s': round(entries / decrypt_s),
+        'encrypt_mb_s': round(payload_mb / encrypt_s, 2),
+        'decrypt_mb_s': round(payload_mb / decrypt_s, 2)
+    }
+
+def print_table(results):
+    """Affiche les résultats en tableau"""
+    header = f"{'engine':<10} {'plain':>7} {'stored':>8} {'overhead':>9} {'enc/s':>9} {'dec/s':>9} {'enc MB/s':>9} {'dec MB/s':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['engine']:<10} {r['plaintext_bytes']:>7} {r['stored_bytes']:>8} {r['overhead_bytes']:>9} "
+            f"{r['encrypt_ops_s']:>9} {r['decrypt_ops_s']:>9} {r['encrypt_mb_s']:>9} {r['decrypt_mb_s']:>9}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Fernet, AES-GCM et ChaCha20-Poly1305")
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--note-sizes', default="0,1024,16384", help="Tailles de notes, séparées par des virgules")
+    parser.add_argument('--json', action='store_true', help="Sortie JSON")
+    args = parser.parse_args()
+    
+    results = []
+    for note_size in [int(n) for n in args.note_sizes.split(',')]:
+        for engine in ENGINES:
+            results.append(bench_engine(engine, args.entries, note_size))
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark des formats de fichier du coffre : taille, écriture et chargement
+
+    python -m benchmarks.storage_bench --entries 10000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+from storage import COMPRESSIONS, JsonVaultStore, decode_document, encode_document
+from benchmarks.common import fast_crypto, make_vault, timed
+
+FORMATS = [('json', 'none')] + [('binary', compression) for compression in COMPRESSIONS]
+
+def bench_format(document, file_format, compression, repeat):
+    """Taille, encodage et chargement à froid (lecture du fichier + décodage)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'passwords.db')
+        store = JsonVaultStore(path, commit_window=0, file_format=file_format, compression=compression)
+        
+        payload, _ = timed(encode_document, document, file_format, compression)
+        encode = [timed(encode_document, document, file_format, compression)[1] for _ in range(repeat)]
+        store.save(document)
+        
+        load = []
+        for _ in range(repeat):
+            store.invalidate()
+            loaded, seconds = timed(store.load)
+            load.append(seconds)
+        assert loaded == document and decode_document(payload) == document
+    
+    return {
+        'format': file_format,
+        'compression': compression,
+        'bytes': len(payload),
+        'encode_ms': round(statistics.median(encode) * 1000, 2),
+        'load_ms': round(statistics.median(load) * 1000, 2)
+    }
+
+def print_table(results):
+    """Affiche les résultats, ratios par rapport au JSON historique"""
+    base = results[0]
+    header = f"{'format':<8} {'compression':<12} {'bytes':>11} {'size':>7} {'encode ms':>10} {'load ms':>9} {'load':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['format']:<8} {r['compression']:<12} {r['bytes']:>11} {r['bytes'] / base['bytes']:>6.0%} "
+            f"{r['encode_ms']:>10} {r['load_ms']:>9} {r['load_ms'] / base['load_ms']:>6.0%}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare le JSON historique et le conteneur binaire")
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--note-size', type=int, default=256)
+    parser.add_argument('--engine', help="Moteur de chiffrement des entrées (fernet, aesgcm, chacha20)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Sortie JSON")
+    args = parser.parse_args()
+    
+    crypto = fast_crypto(args.engine)
+    document = {
+        'header': {'version': 3},
+        'passwords': make_vault(crypto, args.entries, args.note_size)
+    }
+    results = [bench_format(document, file_format, compression, args.repeat) for file_format, compression in FORMATS]
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Compression HTTP : négociation gzip / brotli, réponses compressées et fichiers statiques précompressés
+"""
+
+import gzip
+import os
+from storage import atomic_write
+
+try:
+    import brotli  # Optionnel (pip install brotli) : gzip seul sinon
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get('PM_COMPRESS_MIN_SIZE', 1024))  # En dessous, le gain ne vaut pas le coût
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/manifest+json', 'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon'
+)
+STATIC_SUFFIXES = ('.js', '.json', '.css', '.html', '.svg', '.ico', '.txt')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}  # Fichiers précompressés, à côté de l'original
+
+def available_encodings():
+    """Encodages proposés, du meilleur au moins bon"""
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+def negotiate(accept_encodings):
+    """Encodage retenu selon l'Accept-Encoding du client (werkzeug), ou None"""
+    return accept_encodings.best_match(available_encodings())
+
+def compress(data, encoding, best=False):
+    """Compresse des octets ; best pour les fichiers compressés une fois pour toutes"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+def precompressed(path, encoding):
+    """Version précompressée d'un fichier, si elle existe et n'est pas plus ancienne ; sinon None"""
+    target = path + SUFFIXES[encoding]
+    try:
+        if os.path.getmtime(target) >= os.path.getmtime(path):
+            return target
+    except OSError:
+        pass
+    return None
+
+def precompress_directory(folder):
+    """Écrit les .br / .gz manquants ou périmés des fichiers texte d'un dossier ; retourne leur nombre"""
+    written = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(STATIC_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < COMPRESS_MIN_SIZE:
+                continue
+            
+            for encoding in available_encodings():
+                if precompressed(path, encoding):
+                    continue
+                compressed = compress(data, encoding, best=True)
+                if len(compressed) < len(data):
+                    atomic_write(path + SUFFIXES[encoding], compressed)
+                    written += 1
+    return written
@@ -1,44 +1,335 @@
 #!/usr/bin/env python3
 """
-Module de chiffrement/déchiffrement avec Fernet
+Module de chiffrement/déchiffrement (Fernet, AES-GCM, ChaCha20-Poly1305)
 """
 
-import hashlib
 import base64
+import os
+import struct
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from kdf import legacy_kdf
+
+# Format d'entrée v2 : "v2:<moteur>:<jeton>", jeton stocké une seule fois
+# (v1 historique : base64 d'un jeton Fernet déjà en base64, sans ':')
+ENTRY_PREFIX_V2 = 'v2:'
+ENGINE_FERNET = 'f'
+ENGINE_AESGCM = 'g'
+ENGINE_CHACHA20 = 'c'
+
+# Moteurs sélectionnables -> tag stocké dans l'entrée
+ENGINES = {
+    'fernet': ENGINE_FERNET,
+    'aesgcm': ENGINE_AESGCM,
+    'chacha20': ENGINE_CHACHA20
+}
+AEAD_CLASSES = {
+    ENGINE_AESGCM: AESGCM,
+    ENGINE_CHACHA20: ChaCha20Poly1305
+}
+NONCE_LENGTH = 12
+
+# Flux chiffrés : en-tête MAGIC | taille de segment | préfixe de nonce,
+# puis segments AES-GCM dont le nonce porte le compteur et le marqueur final
+STREAM_MAGIC = b'PMS1'
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_PREFIX_LENGTH = 7
+STREAM_HEADER = struct.Struct('>4sI7s')
+TAG_LENGTH = 16
+
+def derive_subkey(key_bytes, label):
+    """Sous-clé indépendante (HKDF-SHA256) pour un usage donné"""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'password-manager/' + label
+    ).derive(key_bytes)
+
+def _b64encode(data):
+    """Base64 urlsafe sans padding"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    """Inverse de _b64encode"""
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _read_full(stream, size):
+    """Lit exactement size octets (moins seulement en fin de flux)"""
+    parts = []
+    remaining = size
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+def _stream_nonce(prefix, counter, last):
+    """Nonce de segment : préfixe aléatoire | compteur | marqueur de fin"""
+    if counter >= 2 ** 32:
+        raise ValueError("Stream too long")
+    return prefix + struct.pack('>IB', counter, 1 if last else 0)
+
+def _associated_data(value):
+    """Normalise les données associées (nom du compte) en bytes"""
+    if value is None:
+        return None
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+def is_legacy_entry(ciphertext):
+    """Indique si une entrée est au format v1 (double base64)"""
+    return not ciphertext.startswith(ENTRY_PREFIX_V2)
+
+def upgrade_entry(ciphertext):
+    """Convertit une entrée v1 en v2 sans la déchiffrer (aucune clé nécessaire)"""
+    if not is_legacy_entry(ciphertext):
+        return ciphertext
+    token = base64.urlsafe_b64decode(ciphertext.encode('ascii')).decode('ascii')
+    return f"{ENTRY_PREFIX_V2}{ENGINE_FERNET}:{token}"
+
+def migrate_entries(entries):
+    """Convertit un dict d'entrées vers le format v2 ; retourne (entrées, nombre converti)"""
+    migrated = {}
+    count = 0
+    for account, ciphertext in entries.items():
+        try:
+            upgraded = upgrade_entry(ciphertext)
+        except Exception as e:
+            # Entrée illisible : on la laisse intacte
+            print(f"⚠️  Migration skipped for {account}: {e}")
+            upgraded = ciphertext
+        if upgraded != ciphertext:
+            count += 1
+        migrated[account] = upgraded
+    return migrated, count
+
+# Pools partagés par les traitements en lot, créés à la demande
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(kind, max_workers):
+    """Retourne un pool (thread ou process) réutilisable"""
+    with _executors_lock:
+        executor = _executors.get((kind, max_workers))
+        if executor is None:
+            if kind == 'process':
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            else:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crypto')
+            _executors[(kind, max_workers)] = executor
+        return executor
+
+def _crypt_batch(crypto, operation, items, bind_keys=False):
+    """Chiffre/déchiffre une tranche d'éléments en isolant les erreurs"""
+    method = crypto.encrypt if operation == 'encrypt' else crypto.decrypt
+    results = {}
+    errors = {}
+    for key, value in items:
+        try:
+            results[key] = method(value, key if bind_keys else None)
+        except Exception as e:
+            errors[key] = str(e) or type(e).__name__
+    return results, errors
 
 class PasswordCrypto:
-    def __init__(self, master_password):
-        """Initialise le chiffrement avec le master password"""
+    # Réglages des traitements en lot (surchargeables par variables d'environnement)
+    batch_workers = int(os.environ.get('PM_CRYPTO_WORKERS', 0)) or os.cpu_count() or 1
+    batch_executor = os.environ.get('PM_CRYPTO_EXECUTOR', 'thread')  # "thread" ou "process"
+    batch_threshold = 64  # En dessous, le lot est traité sans pool
+    entry_format = int(os.environ.get('PM_ENTRY_FORMAT', 2))  # Format des nouvelles entrées (1 ou 2)
+    engine = os.environ.get('PM_CIPHER_ENGINE', 'fernet')  # Moteur des nouvelles entrées
+    
+    def __init__(self, master_password, kdf=None, engine=None):
+        """Initialise le chiffrement avec le master password (KDF historique par défaut)"""
+        self.kdf = kdf or legacy_kdf()
         self.fernet = self._create_fernet(master_password)
+        if engine:
+            self.engine = engine
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown cipher engine: {self.engine}")
+        self._aeads = {}
     
     def _create_fernet(self, password):
         """Crée une clé Fernet à partir du master password"""
-        # Dérive une clé de 32 bytes à partir du mot de passe
-        key_bytes = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            b'salt_for_password_manager',  # Salt fixe pour simplicité
-            100000  # 100k itérations
-        )
+        # Dérive une clé de 32 bytes avec le KDF du coffre
+        key_bytes = self.kdf.derive(password)
         
         # Encode en base64 pour Fernet
-        key = base64.urlsafe_b64encode(key_bytes)
-        return Fernet(key)
+        self.key = base64.urlsafe_b64encode(key_bytes)
+        return Fernet(self.key)
+    
+    @classmethod
+    def from_key(cls, key_bytes, engine=None):
+        """Construit l'objet depuis une clé brute de 32 bytes (clé de données du coffre)"""
+        crypto = cls.__new__(cls)
+        crypto.__setstate__({
+            'key': base64.urlsafe_b64encode(key_bytes),
+            'kdf': None,
+            'engine': engine or cls.engine
+        })
+        return crypto
+    
+    @property
+    def key_bytes(self):
+        """Clé brute de 32 bytes"""
+        return base64.urlsafe_b64decode(self.key)
+    
+    def __getstate__(self):
+        """Sérialise la clé dérivée (workers du pool process) sans refaire le KDF"""
+        return {'key': self.key, 'kdf': self.kdf, 'engine': self.engine}
+    
+    def __setstate__(self, state):
+        """Reconstruit l'objet à partir de la clé dérivée"""
+        self.key = state['key']
+        self.kdf = state['kdf']
+        self.engine = state['engine']
+        self.fernet = Fernet(self.key)
+        self._aeads = {}
     
-    def encrypt(self, plaintext):
-        """Chiffre un texte"""
+    def _aead(self, tag):
+        """Instance AEAD du moteur, sur une sous-clé dédiée"""
+        aead = self._aeads.get(tag)
+        if aead is None:
+            subkey = derive_subkey(self.key_bytes, b'aead-' + tag.encode('ascii'))
+            aead = AEAD_CLASSES[tag](subkey)
+            self._aeads[tag] = aead
+        return aead
+    
+    def encrypt(self, plaintext, associated_data=None):
+        """Chiffre un texte (associated_data : nom du compte, lié par les moteurs AEAD)"""
         if isinstance(plaintext, str):
             plaintext = plaintext.encode('utf-8')
         
+        tag = ENGINES[self.engine]
+        if tag != ENGINE_FERNET:
+            nonce = os.urandom(NONCE_LENGTH)
+            sealed = self._aead(tag).encrypt(nonce, plaintext, _associated_data(associated_data))
+            return f"{ENTRY_PREFIX_V2}{tag}:{_b64encode(nonce + sealed)}"
+        
+        # Fernet ne sait pas lier de données associées
         encrypted = self.fernet.encrypt(plaintext)
-        return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        if self.entry_format < 2:
+            return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        return f"{ENTRY_PREFIX_V2}{ENGINE_FERNET}:{encrypted.decode('ascii')}"
+    
+    def decrypt(self, ciphertext, associated_data=None):
+        """Déchiffre un texte (formats v1 et v2, moteur lu dans l'entrée)"""
+        if isinstance(ciphertext, bytes):
+            ciphertext = ciphertext.decode('utf-8')
+        
+        if not ciphertext.startswith(ENTRY_PREFIX_V2):
+            encrypted_data = base64.urlsafe_b64decode(ciphertext.encode('utf-8'))
+            return self.fernet.decrypt(encrypted_data).decode('utf-8')
+        
+        tag, _, payload = ciphertext[len(ENTRY_PREFIX_V2):].partition(':')
+        if tag == ENGINE_FERNET:
+            return self.fernet.decrypt(payload.encode('ascii')).decode('utf-8')
+        if tag not in AEAD_CLASSES:
+            raise ValueError(f"Unsupported entry engine: {tag}")
+        
+        blob = _b64decode(payload)
+        nonce, sealed = blob[:NONCE_LENGTH], blob[NONCE_LENGTH:]
+        decrypted = self._aead(tag).decrypt(nonce, sealed, _associated_data(associated_data))
+        return decrypted.decode('utf-8')
     
-    def decrypt(self, ciphertext):
-        """Déchiffre un texte"""
-        if isinstance(ciphertext, str):
-            ciphertext = ciphertext.encode('utf-8')
+    def encrypt_stream(self, src, dst, chunk_size=STREAM_CHUNK_SIZE, associated_data=None):
+        """Chiffre un flux (objets fichier binaires) par segments, en mémoire constante
+        
+        Chaque segment est authentifié ; le dernier porte un marqueur de fin,
+        ce qui détecte toute troncature ou réordonnancement. Retourne le
+        nombre d'octets en clair traités.
+        """
+        prefix = os.urandom(STREAM_PREFIX_LENGTH)
+        header = STREAM_HEADER.pack(STREAM_MAGIC, chunk_size, prefix)
+        aad = header + (_associated_data(associated_data) or b'')
+        aead = AESGCM(derive_subkey(self.key_bytes, b'stream'))
+        dst.write(header)
+        
+        total = 0
+        counter = 0
+        chunk = _read_full(src, chunk_size)
+        while True:
+            # Lecture anticipée d'un segment pour savoir si celui-ci est le dernier
+            following = _read_full(src, chunk_size) if len(chunk) == chunk_size else b''
+            last = not following
+            dst.write(aead.encrypt(_stream_nonce(prefix, counter, last), chunk, aad))
+            total += len(chunk)
+            if last:
+                return total
+            chunk = following
+            counter += 1
+    
+    def decrypt_stream(self, src, dst, associated_data=None):
+        """Déchiffre un flux produit par encrypt_stream ; retourne le nombre d'octets en clair"""
+        header = _read_full(src, STREAM_HEADER.size)
+        if len(header) != STREAM_HEADER.size:
+            raise ValueError("Truncated stream header")
+        magic, chunk_size, prefix = STREAM_HEADER.unpack(header)
+        if magic != STREAM_MAGIC:
+            raise ValueError("Not an encrypted stream")
+        
+        aad = header + (_associated_data(associated_data) or b'')
+        aead = AESGCM(derive_subkey(self.key_bytes, b'stream'))
+        sealed_size = chunk_size + TAG_LENGTH
+        
+        total = 0
+        counter = 0
+        sealed = _read_full(src, sealed_size)
+        while True:
+            following = _read_full(src, sealed_size) if len(sealed) == sealed_size else b''
+            last = not following
+            if len(sealed) < TAG_LENGTH:
+                raise ValueError("Truncated stream")
+            # InvalidTag si le segment est altéré, déplacé ou si le flux est tronqué
+            chunk = aead.decrypt(_stream_nonce(prefix, counter, last), sealed, aad)
+            dst.write(chunk)
+            total += len(chunk)
+            if last:
+                return total
+            sealed = following
+            counter += 1
+    
+    def encrypt_many(self, plaintexts, max_workers=None, executor=None, bind_keys=False):
+        """Chiffre un lot {clé: texte} ; retourne (résultats, erreurs par clé)
+        
+        bind_keys=True utilise chaque clé (nom du compte) comme données associées.
+        """
+        return self._run_batch('encrypt', plaintexts, max_workers, executor, bind_keys)
+    
+    def decrypt_many(self, ciphertexts, max_workers=None, executor=None, bind_keys=False):
+        """Déchiffre un lot {clé: texte chiffré} ; retourne (résultats, erreurs par clé)
+        
+        executor est "thread", "process" (pools partagés) ou un pool fourni par l'appelant.
+        """
+        return self._run_batch('decrypt', ciphertexts, max_workers, executor, bind_keys)
+    
+    def _run_batch(self, operation, items, max_workers, executor, bind_keys=False):
+        """Répartit un lot sur le pool configuré, en conservant l'ordre d'entrée"""
+        items = list(items.items() if hasattr(items, 'items') else items)
+        workers = max_workers or self.batch_workers
+        kind = executor or self.batch_executor
+        
+        if workers <= 1 or len(items) < self.batch_threshold:
+            return _crypt_batch(self, operation, items, bind_keys)
+        
+        # Quelques tranches par worker pour lisser les écarts de durée
+        slices = min(len(items), workers * 4)
+        chunks = [items[i::slices] for i in range(slices)]
+        pool = kind if isinstance(kind, Executor) else _get_executor(kind, workers)
+        futures = [pool.submit(_crypt_batch, self, operation, chunk, bind_keys) for chunk in chunks]
+        
+        collected = {}
+        errors = {}
+        for future in futures:
+            chunk_results, chunk_errors = future.result()
+            collected.update(chunk_results)
+            errors.update(chunk_errors)
         
-        encrypted_data = base64.urlsafe_b64decode(ciphertext)
-        decrypted = self.fernet.decrypt(encrypted_data)
-        return decrypted.decode('utf-8')
\ No newline at end of file
+        results = {key: collected[key] for key, _ in items if key in collected}
+        return results, errors
@@ -7,12 +7,14 @@ import json
 import os
 import dropbox
 from dropbox.exceptions import ApiError, AuthError
+from storage import atomic_write
 
 class DropboxSync:
     def __init__(self, config_file="config.json"):
         """Initialise la connexion Dropbox avec Refresh Token"""
         self.dbx = None
         self.config_file = config_file
+        self._synced = {}  # Chemin distant -> signature du fichier local au dernier transfert
         self._load_config()
     
     def _load_config(self):
@@ -109,9 +111,11 @@ class DropboxSync:
         
         try:
             print(f"⬇️  Downloading {remote_path}...")
-            with open(local_file, 'wb') as f:
-                metadata, response = self.dbx.files_download(remote_path)
-                f.write(response.content)
+            # Le fichier local n'est touché qu'une fois le contenu reçu, puis
+            # remplacé d'un coup (un lecteur qui l'a mappé garde l'ancien contenu)
+            metadata, response = self.dbx.files_download(remote_path)
+            atomic_write(local_file, response.content)
+            self._synced[remote_path] = self._signature(local_file)
             print(f"✅ Downloaded {local_file} ({metadata.size} bytes)")
             return True
             
@@ -130,8 +134,33 @@ class DropboxSync:
             print(f"❌ Download error: {e}")
             return False
     
-    def upload(self, local_file, remote_path=None):
-        """Upload un fichier vers Dropbox"""
+    def is_missing(self, local_file, remote_path=None):
+        """True seulement si Dropbox confirme que le fichier n'existe pas (False en cas d'erreur)"""
+        if not self.dbx:
+            return False
+        
+        if remote_path is None:
+            remote_path = f"/{local_file}"
+        
+        try:
+            self.dbx.files_get_metadata(remote_path)
+            return False
+        except ApiError as e:
+            return e.error.is_path() and e.error.get_path().is_not_found()
+        except Exception as e:
+            print(f"❌ Metadata error: {e}")
+            return False
+    
+    def _signature(self, local_file):
+        st = os.stat(local_file)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def upload(self, local_file, remote_path=None, if_changed=False):
+        """Upload un fichier vers Dropbox
+        
+        Avec if_changed, un fichier inchangé depuis son dernier upload (ou
+        download) par ce processus n'est pas renvoyé.
+        """
         if not self.dbx:
             print("❌ Dropbox non configuré")
             return False
@@ -144,6 +173,11 @@ class DropboxSync:
             remote_path = f"/{local_file}"
         
         try:
+            signature = self._signature(local_file)
+            if if_changed and self._synced.get(remote_path) == signature:
+                print(f"ℹ️  {remote_path} already up to date")
+                return True
+            
             file_size = os.path.getsize(local_file)
             print(f"⬆️  Uploading {local_file} ({file_size} bytes)...")
             
@@ -157,6 +191,7 @@ class DropboxSync:
                     mode=dropbox.files.WriteMode('overwrite')
                 )
             
+            self._synced[remote_path] = signature
             print(f"✅ Uploaded to {remote_path} (rev: {result.rev[:8]}...)")
             return True
             
@@ -167,6 +202,43 @@ class DropboxSync:
             print(f"❌ Upload error: {e}")
             return False
     
+    def download_companion_files(self, store):
+        """Télécharge les fichiers annexes du coffre (journal, shards) : ceux du coffre téléchargé, ou aucun"""
+        referenced = set(store.referenced_paths())
+        for path in store.sync_paths()[1:]:
+            if self.download(path) or not os.path.exists(path):
+                continue
+            if path not in referenced and self.is_missing(path):
+                # L'ancien journal local ne correspond pas au snapshot téléchargé
+                os.remove(path)
+            else:
+                print(f"⚠️  Keeping local {path}: not downloaded")
+        
+        # Un coffre venu d'un autre format (fichier unique -> shards) n'est converti qu'une fois complet
+        store.migrate()
+    
+    def upload_companion_files(self, store):
+        """Envoie les fichiers annexes du coffre (journal, shards) modifiés depuis le dernier envoi"""
+        # Toujours avant le snapshot : rejouer un journal déjà compacté est sans
+        # effet, alors qu'un snapshot ancien avec un journal compacté perdrait des records
+        for path in store.sync_paths()[1:]:
+            if os.path.exists(path):
+                self.upload(path, if_changed=True)
+    
+    def copy(self, from_path, to_path):
+        """Copie un fichier côté Dropbox, sans le ré-uploader"""
+        if not self.dbx:
+            print("❌ Dropbox non configuré")
+            return False
+        
+        try:
+            self.dbx.files_copy_v2(from_path, to_path)
+            print(f"✅ Copied {from_path} to {to_path}")
+            return True
+        except Exception as e:
+            print(f"❌ Copy error: {e}")
+            return False
+    
     def list_files(self, folder_path=""):
         """Liste les fichiers dans un dossier Dropbox"""
         if not self.dbx:
@@ -9,8 +9,12 @@ import json
 import os
 import threading
 import time
-from crypto import PasswordCrypto
+from crypto import migrate_entries
 from dropbox_sync import DropboxSync
+from search_index import SearchIndex, search_key
+from storage import open_store
+from vault_model import VaultView
+from vault import InvalidMasterPassword, change_master_password, create_vault, ensure_header, has_legacy_key, is_initialized, rekey_vault, unlock
 import secrets
 import string
 import pyperclip
@@ -29,9 +33,17 @@ class ModernPasswordManager:
         # Variables
         self.crypto = None
         self.dropbox = DropboxSync()
-        self.passwords = {}
-        self.db_file = "passwords.db"
+        self.header = None  # En-tête du coffre (version, KDF, valeur de contrôle)
+        self.auth_token = None  # Conservé tel quel pour les anciens clients
+        self.store = open_store()  # Stockage du coffre (PM_STORAGE=json|journal|mmap|sharded|sqlite)
+        self.db_file = self.store.path
         self.current_passwords = {}  # Pour le filtrage
+        self.view = None  # Entrées déchiffrées à la demande (cache LRU borné)
+        self.search_index = SearchIndex(self.db_file + '.search')  # Recherche sans tout déchiffrer
+        self.plaintext_cache_size = int(os.environ.get('PM_PLAINTEXT_CACHE', 256))
+        self.page_size = 50  # Cartes affichées (et déchiffrées) par page
+        self.visible_count = self.page_size
+        self.migrate_entries = os.environ.get('PM_MIGRATE_ENTRIES') == '1'  # Migration (opt-in) : entrées v1 -> v2, clé historique -> clé de données aléatoire
         
         # Colors palette minimaliste
         self.colors = {
@@ -162,27 +174,47 @@ class ModernPasswordManager:
     def _auth_worker(self, master_password):
         """Worker d'authentification avec gestion premier lancement"""
         try:
-            self.crypto = PasswordCrypto(master_password)
-            
             # Sync Dropbox
             self.app.after(0, lambda: self.show_status("Syncing with Dropbox...", "info"))
             
             # Essayer de télécharger la base existante
-            auth_token = None
+            data = None
             try:
-                auth_token = self.load_database()
+                data = self.load_database()
             except Exception as e:
                 # Erreur de sync Dropbox - pas grave pour premier lancement
                 print(f"Dropbox sync error (normal for first use): {e}")
             
-            if auth_token:
+            if data:
                 # Base existante trouvée - vérifier le master password
                 try:
-                    self.crypto.decrypt(auth_token)
+                    self.crypto = unlock(data, master_password)
+                    self.header = data.get('header')
+                    self.auth_token = data.get('auth_token')
+                    
+                    # Coffre sans enveloppe : en-tête ajouté une seule fois
+                    if ensure_header(data, self.crypto, master_password):
+                        self.header = data['header']
+                        self.save_meta()
+                    
+                    # Clé historique (PBKDF2 à salt fixe) : tout est rechiffré une fois, sur demande
+                    if self.migrate_entries and has_legacy_key(data):
+                        document = self.store.load()
+                        self.crypto = rekey_vault(document, self.crypto, master_password)
+                        self.store.save(document)
+                        self.header = document['header']
+                        self.auth_token = None
+                        print("✅ Vault re-encrypted under a new data key")
+                        threading.Thread(target=self._upload_worker, daemon=True).start()
+                    
                     # Master password correct
                     self.app.after(0, self.create_main_interface)
-                except Exception:
+                    
+                    if self.migrate_entries:
+                        threading.Thread(target=self._migration_worker, daemon=True).start()
+                except InvalidMasterPassword:
                     # Master password incorrect
+                    self.crypto = None
                     self.app.after(0, lambda: [
                         self.show_status("Incorrect master password", "error"),
                         self.login_button.configure(state="normal", text="Unlock")
@@ -192,14 +224,13 @@ class ModernPasswordManager:
                 self.app.after(0, lambda: self.show_status("Creating new database...", "info"))
                 
                 try:
-                    # Créer le token d'authentification
-                    token = self.crypto.encrypt("AUTH_VALID")
-                    
-                    # Initialiser une base vide
-                    self.passwords = {}
+                    # Nouveau coffre : salt aléatoire, en-tête écrit une fois
+                    data, self.crypto = create_vault(master_password)
+                    self.header = data['header']
+                    self.auth_token = data.get('auth_token')
                     
                     # Sauvegarder la nouvelle base
-                    self.save_database(token)
+                    self.save_database()
                     
                     # Aller à l'interface principale
                     self.app.after(0, lambda: [
@@ -237,11 +268,15 @@ class ModernPasswordManager:
     def load_database(self):
         """Charge la base de données avec gestion robuste des erreurs"""
         try:
+            # Le fichier local va être remplacé : on relâche le stockage
+            self.store.close()
+            
             # Essayer de télécharger depuis Dropbox
             download_success = self.dropbox.download(self.db_file)
             
             if download_success:
                 print("✅ Database downloaded from Dropbox")
+                self.dropbox.download_companion_files(self.store)
             else:
                 print("ℹ️  No existing database on Dropbox (normal for first use)")
                 
@@ -252,22 +287,20 @@ class ModernPasswordManager:
         # Essayer de charger le fichier local
         if os.path.exists(self.db_file):
             try:
-                with open(self.db_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # Vérifier la structure du fichier
-                    if isinstance(data, dict):
-                        self.passwords = data.get('passwords', {})
-                        auth_token = data.get('auth_token')
-                        
-                        if auth_token:
-                            print("✅ Existing database loaded")
-                            return auth_token
-                        else:
-                            print("⚠️  Database exists but no auth token found")
+                # Seules les méta-données servent au déverrouillage : les entrées
+                # restent dans le stockage et sont lues à la demande
+                data = self.store.load_meta()
+                
+                # Vérifier la structure du fichier
+                if isinstance(data, dict):
+                    if is_initialized(data):
+                        print("✅ Existing database loaded")
+                        return data
                     else:
-                        print("⚠️  Invalid database format")
-                        
+                        print("⚠️  Database exists but no header or auth token found")
+                else:
+                    print("⚠️  Invalid database format")
+                    
             except json.JSONDecodeError:
                 print("⚠️  Corrupted database file, will create new one")
             except Exception as file_error:
@@ -288,8 +321,14 @@ class ModernPasswordManager:
             now = datetime.datetime.now()
             backup_name = f"passwords-{now.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
             
-            # Upload du backup sur Dropbox
-            success = self.dropbox.upload(self.db_file, f"/{backup_name}")
+            # Copies côté Dropbox des fichiers qui viennent d'être envoyés :
+            # fichiers annexes (journal, shards) sous le même horodatage, avant le fichier principal
+            for path in self.store.sync_paths()[1:]:
+                if os.path.exists(path):
+                    self.dropbox.copy(f"/{path}", f"/{backup_name}{path[len(self.db_file):]}")
+            
+            # Backup du fichier principal
+            success = self.dropbox.copy(f"/{self.db_file}", f"/{backup_name}")
             if success:
                 print(f"📦 Backup créé sur Dropbox: {backup_name}")
                 return True
@@ -302,17 +341,19 @@ class ModernPasswordManager:
             return False
     
     # ✅ MODIFIEZ CETTE MÉTHODE EXISTANTE (vers ligne 200)
-    def save_database(self, auth_token):
-        """Sauvegarde la base avec gestion d'erreurs robuste"""
+    def save_database(self):
+        """Écrit un nouveau coffre (vide) avec gestion d'erreurs robuste"""
         try:
+            # Les entrées passent ensuite par save_entries
             data = {
-                'auth_token': auth_token,
-                'passwords': self.passwords
+                'header': self.header,
+                'passwords': {}
             }
+            if self.auth_token:
+                data['auth_token'] = self.auth_token
             
             # Sauvegarder localement d'abord
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self.store.save(data)
             
             print("✅ Database saved locally")
             
@@ -322,6 +363,31 @@ class ModernPasswordManager:
         except Exception as e:
             print(f"❌ Error saving database: {e}")
             raise e
+    
+    def save_meta(self):
+        """Écrit l'en-tête (et l'auth_token historique) sans réécrire les entrées"""
+        meta = {'header': self.header}
+        if self.auth_token:
+            meta['auth_token'] = self.auth_token
+        
+        self.store.save_meta(meta)
+        threading.Thread(target=self._upload_worker, daemon=True).start()
+    
+    def save_entries(self, entries, removed=(), expected=None):
+        """Écrit uniquement les entrées modifiées (une ligne chacune en SQLite)
+        
+        Avec expected, seules les entrées inchangées depuis sont écrites ;
+        retourne le nombre d'entrées écrites. Les entrées de removed (ancien nom
+        d'un compte renommé) ne sont supprimées qu'une fois toutes les autres écrites.
+        """
+        count = self.store.put_many(entries, expected=expected) if entries else 0
+        if count == len(entries):
+            for account in removed:
+                self.store.delete(account)
+        
+        print("✅ Database saved locally")
+        threading.Thread(target=self._upload_worker, daemon=True).start()
+        return count
   
     def _upload_worker(self):
         """Upload vers Dropbox en arrière-plan avec retry"""
@@ -330,7 +396,9 @@ class ModernPasswordManager:
         
         for attempt in range(max_retries):
             try:
-                success = self.dropbox.upload(self.db_file)
+                self.store.flush()
+                self.dropbox.upload_companion_files(self.store)
+                success = self.dropbox.upload(self.db_file, if_changed=True)
                 if success:
                     print("✅ Database uploaded to Dropbox")
                     
@@ -348,10 +416,40 @@ class ModernPasswordManager:
         
         print("❌ All upload attempts failed (database saved locally only)")
         
+    def _migration_worker(self):
+        """Convertit les entrées v1 au format v2 en arrière-plan"""
+        snapshot = self.store.entries()
+        migrated, count = migrate_entries(snapshot)
+        if count:
+            self.app.after(0, lambda: self._apply_migration(snapshot, migrated))
+    
+    def _apply_migration(self, snapshot, migrated):
+        """Applique la migration (thread UI) sans écraser les entrées modifiées entre-temps"""
+        if not self.crypto:
+            return
+        
+        changed = {account: upgraded for account, upgraded in migrated.items() if upgraded != snapshot[account]}
+        if changed:
+            count = self.save_entries(changed, expected=snapshot)
+            print(f"✅ Migrated {count} entries to format v2")
+        
+    def _index_worker(self, crypto):
+        """Complète l'index de recherche en arrière-plan"""
+        try:
+            self.search_index.build(self.store, crypto)
+        except Exception as e:
+            print(f"⚠️  Search index error: {e}")
+    
     def create_main_interface(self):
         """Interface principale minimaliste"""
         self.clear_interface()
         
+        # Aucune entrée n'est déchiffrée à l'ouverture
+        if self.view is None or self.view.crypto is not self.crypto:
+            self.view = VaultView(self.store, self.crypto, self.plaintext_cache_size)
+            threading.Thread(target=self._index_worker, args=(self.crypto,), daemon=True).start()
+        self.visible_count = self.page_size
+        
         # Layout en grid
         self.app.grid_columnconfigure(0, weight=1)
         self.app.grid_rowconfigure(1, weight=1)
@@ -416,6 +514,21 @@ class ModernPasswordManager:
             command=self.logout
         )
         logout_button.pack(side="right", padx=(10, 0))
+        
+        # Bouton changement de master password
+        master_button = ctk.CTkButton(
+            actions_frame,
+            text="🔑",
+            width=45,
+            height=35,
+            font=ctk.CTkFont(size=13),
+            corner_radius=10,
+            fg_color="transparent",
+            border_width=1,
+            text_color=self.colors['text_secondary'],
+            command=self.create_change_master_window
+        )
+        master_button.pack(side="right", padx=(10, 0))
     
     def create_main_content(self):
         """Contenu principal"""
@@ -455,11 +568,8 @@ class ModernPasswordManager:
         for widget in self.passwords_frame.winfo_children():
             widget.destroy()
         
-        # Filter passwords
-        filtered = {}
-        for account, data in self.passwords.items():
-            if filter_text.lower() in account.lower():
-                filtered[account] = data
+        # Noms filtrés en clair ; identifiants et URLs via l'index (seuls les candidats sont déchiffrés)
+        filtered = self.search_index.search(self.view, filter_text) if filter_text else self.view.accounts()
         
         if not filtered:
             # Empty state
@@ -472,13 +582,31 @@ class ModernPasswordManager:
             empty_label.pack(pady=100)
             return
         
+        # Seule la page affichée est déchiffrée (puis gardée dans le cache LRU)
+        page = filtered[:self.visible_count]
+        plaintexts, errors = self.view.get_many(page)
+        
         # Create password cards
-        for i, (account, encrypted_data) in enumerate(filtered.items()):
-            try:
-                decrypted = json.loads(self.crypto.decrypt(encrypted_data))
-                self.create_password_card(account, decrypted, i)
-            except:
-                continue
+        for i, (account, data) in enumerate(plaintexts.items()):
+            self.create_password_card(account, data, i)
+        
+        remaining = len(filtered) - len(page)
+        if remaining > 0:
+            more_btn = ctk.CTkButton(
+                self.passwords_frame,
+                text=f"Show more ({remaining} remaining)",
+                height=36,
+                corner_radius=8,
+                fg_color="transparent",
+                border_width=1,
+                command=lambda: self.show_more_passwords(filter_text)
+            )
+            more_btn.pack(pady=10)
+        
+        if errors:
+            for account, error in errors.items():
+                print(f"⚠️  Decrypt error for {account}: {error}")
+            self.show_toast(f"{len(errors)} entries could not be decrypted", "error")
     
     def create_password_card(self, account, data, index):
         """Crée une carte de mot de passe minimaliste"""
@@ -602,9 +730,15 @@ class ModernPasswordManager:
         
         self.app.after(3000, hide_toast)
     
+    def show_more_passwords(self, filter_text):
+        """Affiche (et déchiffre) la page suivante"""
+        self.visible_count += self.page_size
+        self.refresh_passwords(filter_text)
+    
     def on_search(self, event):
         """Event de recherche"""
         filter_text = self.search_entry.get()
+        self.visible_count = self.page_size
         self.refresh_passwords(filter_text)
     
     def show_password_details(self, account, data):
@@ -867,6 +1001,90 @@ class ModernPasswordManager:
         # Bind Escape pour annuler
         window.bind('<Escape>', lambda e: window.destroy())
     
+    def create_change_master_window(self):
+        """Fenêtre de changement du master password"""
+        window = ctk.CTkToplevel(self.app)
+        window.title("Change Master Password")
+        window.geometry("420x380")
+        window.resizable(False, False)
+        window.transient(self.app)
+        window.grab_set()
+        
+        main_frame = ctk.CTkFrame(window, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=30, pady=30)
+        
+        title_label = ctk.CTkLabel(
+            main_frame,
+            text="Change Master Password",
+            font=ctk.CTkFont(size=20, weight="bold")
+        )
+        title_label.pack(pady=(0, 20))
+        
+        entries = []
+        for placeholder in ("Current master password", "New master password", "Confirm new password"):
+            entry = ctk.CTkEntry(
+                main_frame,
+                placeholder_text=placeholder,
+                show="●",
+                height=40,
+                font=ctk.CTkFont(size=14),
+                corner_radius=10
+            )
+            entry.pack(fill="x", pady=(0, 15))
+            entries.append(entry)
+        entries[0].focus()
+        
+        save_btn = ctk.CTkButton(
+            main_frame,
+            text="🔑 Change Password",
+            height=45,
+            corner_radius=10,
+            font=ctk.CTkFont(size=14, weight="bold"),
+            command=lambda: self.change_master_password(window, save_btn, *entries)
+        )
+        save_btn.pack(fill="x", pady=(10, 0))
+        
+        window.bind('<Escape>', lambda e: window.destroy())
+    
+    def change_master_password(self, window, save_btn, current_entry, new_entry, confirm_entry):
+        """Valide le formulaire puis ré-enveloppe la clé de données en arrière-plan"""
+        current_password = current_entry.get()
+        new_password = new_entry.get()
+        
+        if not current_password or not new_password:
+            self.show_toast("All fields are required!", "error")
+            return
+        
+        if new_password != confirm_entry.get():
+            confirm_entry.configure(border_color="red")
+            self.show_toast("Passwords do not match!", "error")
+            return
+        
+        save_btn.configure(text="🔑 Changing...", state="disabled")
+        
+        def worker():
+            # Deux dérivations de clé : hors du thread UI
+            data = {'header': self.header, 'auth_token': self.auth_token}
+            try:
+                change_master_password(data, current_password, new_password)
+            except InvalidMasterPassword:
+                self.app.after(0, lambda: [
+                    current_entry.configure(border_color="red"),
+                    save_btn.configure(text="🔑 Change Password", state="normal"),
+                    self.show_toast("Incorrect master password", "error")
+                ])
+                return
+            
+            def apply():
+                self.header = data['header']
+                self.save_meta()
+                window.destroy()
+                self.show_toast("Master password changed!")
+            
+            self.app.after(0, apply)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
     def generate_and_set_password(self, entry):
         """Génère et définit un mot de passe"""
         password = self.generate_password()
@@ -910,7 +1128,7 @@ class ModernPasswordManager:
         password_entry.configure(border_color=("gray60", "gray40"))
         
         # Check if account exists
-        if not original_account and account in self.passwords:
+        if not original_account and self.store.get(account) is not None:
             account_entry.configure(border_color="red")
             self.show_toast("Account already exists!")
             account_entry.focus()
@@ -918,12 +1136,11 @@ class ModernPasswordManager:
         
         # Remove old account if renamed
         if original_account and original_account != account:
-            if account in self.passwords:
+            if self.store.get(account) is not None:
                 account_entry.configure(border_color="red")
                 self.show_toast("An account with this name already exists!")
                 account_entry.focus()
                 return
-            del self.passwords[original_account]
         
         # Show saving feedback
         save_btn = None
@@ -948,11 +1165,11 @@ class ModernPasswordManager:
                 'notes': notes
             }
             
-            encrypted_data = self.crypto.encrypt(json.dumps(data))
-            self.passwords[account] = encrypted_data
-            
-            auth_token = self.crypto.encrypt("AUTH_VALID")
-            self.save_database(auth_token)
+            encrypted_data = self.crypto.encrypt(json.dumps(data), account)
+            renamed = [original_account] if original_account and original_account != account else []
+            self.save_entries({account: encrypted_data}, removed=renamed)
+            self.search_index.remove(renamed)
+            self.search_index.update(search_key(self.crypto), {account: (encrypted_data, data)})
             
             # Refresh the passwords list
             self.refresh_passwords()
@@ -972,8 +1189,12 @@ class ModernPasswordManager:
     
     def logout(self):
         """Déconnexion"""
+        if self.view:
+            self.view.wipe()
+        self.view = None
         self.crypto = None
-        self.passwords = {}
+        self.header = None
+        self.auth_token = None
         self.create_login_interface()
     
     def run(self):
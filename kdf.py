@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Dérivation de clé (PBKDF2 / scrypt) avec salt par coffre et calibration
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+KEY_LENGTH = 32
+SALT_LENGTH = 16
+LEGACY_SALT = b'salt_for_password_manager'
+PROFILE_FILE = "kdf_profile.json"  # Coût calibré pour cette machine
+
+class PBKDF2KDF:
+    name = 'pbkdf2-sha256'
+    
+    def __init__(self, salt, iterations=600000):
+        """PBKDF2-HMAC-SHA256"""
+        self.salt = salt
+        self.iterations = int(iterations)
+    
+    def derive(self, password):
+        """Dérive une clé de 32 bytes"""
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), self.salt, self.iterations, KEY_LENGTH)
+    
+    def cost_params(self):
+        """Paramètres de coût (sans le salt)"""
+        return {'iterations': self.iterations}
+    
+    def to_params(self):
+        """Paramètres à stocker dans le coffre"""
+        return {'name': self.name, 'salt': _b64(self.salt), **self.cost_params()}
+
+class ScryptKDF:
+    name = 'scrypt'
+    
+    def __init__(self, salt, n=2 ** 15, r=8, p=1):
+        """scrypt (hashlib.scrypt)"""
+        self.salt = salt
+        self.n = int(n)
+        self.r = int(r)
+        self.p = int(p)
+    
+    def derive(self, password):
+        """Dérive une clé de 32 bytes"""
+        # OpenSSL refuse par défaut au-delà de 32 MiB : on prévoit large
+        maxmem = 128 * self.r * (self.n + self.p + 2) + 16 * 1024 * 1024
+        return hashlib.scrypt(
+            password.encode('utf-8'),
+            salt=self.salt,
+            n=self.n,
+            r=self.r,
+            p=self.p,
+            maxmem=maxmem,
+            dklen=KEY_LENGTH
+        )
+    
+    def cost_params(self):
+        """Paramètres de coût (sans le salt)"""
+        return {'n': self.n, 'r': self.r, 'p': self.p}
+    
+    def to_params(self):
+        """Paramètres à stocker dans le coffre"""
+        return {'name': self.name, 'salt': _b64(self.salt), **self.cost_params()}
+
+BACKENDS = {
+    PBKDF2KDF.name: PBKDF2KDF,
+    ScryptKDF.name: ScryptKDF
+}
+
+DEFAULT_BACKEND = ScryptKDF.name
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def legacy_kdf():
+    """KDF historique : PBKDF2 100k itérations avec salt fixe"""
+    return PBKDF2KDF(LEGACY_SALT, iterations=100000)
+
+def from_params(params):
+    """Reconstruit un KDF depuis les paramètres du coffre (None = historique)"""
+    if not params:
+        return legacy_kdf()
+    
+    params = dict(params)
+    name = params.pop('name')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown KDF: {name}")
+    
+    salt = base64.urlsafe_b64decode(params.pop('salt').encode('ascii'))
+    return BACKENDS[name](salt, **params)
+
+def load_profile(profile_file=PROFILE_FILE):
+    """Charge le profil calibré (ou None)"""
+    if not os.path.exists(profile_file):
+        return None
+    try:
+        with open(profile_file, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️  Invalid KDF profile {profile_file}: {e}")
+        return None
+
+def new_kdf(name=None, profile_file=PROFILE_FILE):
+    """KDF pour un nouveau coffre : salt aléatoire, coût du profil calibré si présent"""
+    cost = {}
+    profile = load_profile(profile_file)
+    
+    if profile and (name is None or profile.get('name') == name):
+        name = profile['name']
+        cost = {k: v for k, v in profile.items() if k not in ('name', 'target_ms', 'measured_ms')}
+    
+    name = name or DEFAULT_BACKEND
+    return BACKENDS[name](os.urandom(SALT_LENGTH), **cost)
+
+def measure(kdf, password="calibration-password"):
+    """Durée d'une dérivation en millisecondes"""
+    start = time.perf_counter()
+    kdf.derive(password)
+    return (time.perf_counter() - start) * 1000
+
+def calibrate(name=DEFAULT_BACKEND, target_ms=250):
+    """Choisit le coût qui approche la latence de déverrouillage visée"""
+    salt = os.urandom(SALT_LENGTH)
+    
+    if name == PBKDF2KDF.name:
+        # Coût linéaire : une mesure suffit pour extrapoler
+        probe = PBKDF2KDF(salt, iterations=50000)
+        elapsed = min(measure(probe) for _ in range(3))
+        iterations = max(100000, int(probe.iterations * target_ms / elapsed) // 1000 * 1000)
+        kdf = PBKDF2KDF(salt, iterations=iterations)
+    elif name == ScryptKDF.name:
+        # n doit être une puissance de 2 : on double jusqu'à dépasser la cible
+        kdf = ScryptKDF(salt, n=2 ** 12)
+        elapsed = measure(kdf)
+        while elapsed < target_ms and kdf.n < 2 ** 20:
+            candidate = ScryptKDF(salt, n=kdf.n * 2)
+            candidate_ms = measure(candidate)
+            # Garde le n le plus proche de la cible
+            if abs(candidate_ms - target_ms) > abs(elapsed - target_ms):
+                break
+            kdf, elapsed = candidate, candidate_ms
+    else:
+        raise ValueError(f"Unknown KDF: {name}")
+    
+    return {
+        'name': kdf.name,
+        **kdf.cost_params(),
+        'target_ms': target_ms,
+        'measured_ms': round(measure(kdf), 1)
+    }
+
+class KDFPoolSaturated(Exception):
+    """Pool KDF saturé : la requête est refusée immédiatement"""
+
+class KDFPool:
+    def __init__(self, max_workers=None, max_queue=16, timeout=30):
+        """Pool borné pour les dérivations de clé (hashlib relâche le GIL)"""
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='kdf')
+        # Une place par tâche en cours ou en attente
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+    
+    def is_saturated(self):
+        """Vérification rapide, avant tout travail coûteux"""
+        return self.pending >= self.max_workers + self.max_queue
+    
+    def run(self, fn, *args):
+        """Exécute fn dans le pool et attend le résultat ; KDFPoolSaturated si plein"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise KDFPoolSaturated()
+        
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # La tâche continue et garde sa place jusqu'à la fin
+            raise KDFPoolSaturated()
+    
+    def _release(self, future):
+        """Libère la place d'une tâche terminée"""
+        with self._lock:
+            self.pending -= 1
+            if future is not None:
+                self.completed += 1
+        self._slots.release()
+    
+    def stats(self):
+        """Compteurs du pool"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibration du KDF pour cette machine")
+    parser.add_argument('command', choices=['calibrate'])
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument('--target-ms', type=float, default=250)
+    parser.add_argument('--save', action='store_true', help=f"Écrit le résultat dans {PROFILE_FILE}")
+    args = parser.parse_args()
+    
+    print(f"⏱️  Calibrating {args.backend} for ~{args.target_ms:g} ms...")
+    profile = calibrate(args.backend, args.target_ms)
+    print(json.dumps(profile, indent=2))
+    
+    if args.save:
+        with open(PROFILE_FILE, 'w') as f:
+            json.dump(profile, f, indent=2)
+        print(f"✅ Profile saved to {PROFILE_FILE} (used for new vaults)")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Cache serveur des clés dérivées, indexé par un handle de session opaque
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+class KeyCache:
+    def __init__(self, max_entries=256, idle_ttl=900, on_evict=None):
+        """Initialise le cache (éviction LRU + expiration après inactivité)
+
+        on_evict(valeur) est appelé pour chaque valeur oubliée (éviction,
+        expiration, discard), hors verrou.
+        """
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # handle -> [crypto, dernier accès]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, crypto):
+        """Stocke la clé dérivée et retourne un nouveau handle opaque"""
+        handle = secrets.token_urlsafe(32)
+        now = time.monotonic()
+
+        with self._lock:
+            evicted = self._purge_expired(now)
+            self._entries[handle] = [crypto, now]
+
+            # LRU : les entrées les moins récemment utilisées sont en tête
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1][0])
+                self.evictions += 1
+
+        self._evicted(evicted)
+        return handle
+
+    def get(self, handle):
+        """Retourne l'objet crypto associé au handle, ou None"""
+        if not handle:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(handle)
+
+            if entry is None or now - entry[1] > self.idle_ttl:
+                expired = entry is not None
+                if expired:
+                    del self._entries[handle]
+                    self.evictions += 1
+                self.misses += 1
+            else:
+                entry[1] = now
+                self._entries.move_to_end(handle)
+                self.hits += 1
+                return entry[0]
+
+        if expired:
+            self._evicted([entry[0]])
+        return None
+
+    def discard(self, handle):
+        """Oublie la clé associée au handle (logout)"""
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+        if entry is not None:
+            self._evicted([entry[0]])
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            values = [entry[0] for entry in self._entries.values()]
+            self._entries.clear()
+        self._evicted(values)
+
+    def stats(self):
+        """Compteurs hit/miss du cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _purge_expired(self, now):
+        """Retire les entrées inactives depuis plus de idle_ttl (appel sous verrou) ; retourne leurs valeurs"""
+        expired = []
+        while self._entries:
+            handle, entry = next(iter(self._entries.items()))
+            if now - entry[1] <= self.idle_ttl:
+                break
+            del self._entries[handle]
+            expired.append(entry[0])
+            self.evictions += 1
+        return expired
+
+    def _evicted(self, values):
+        if self.on_evict:
+            for value in values:
+                self.on_evict(value)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Vérification du coffre (scrub) : chaque entrée est déchiffrée et authentifiée, en parallèle
+"""
+
+import argparse
+import datetime
+import getpass
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from crypto import derive_subkey
+from storage import atomic_write, open_store
+from vault import InvalidMasterPassword, is_initialized, unlock
+
+SCRUB_EXECUTOR = os.environ.get('PM_SCRUB_EXECUTOR', 'process')  # Pool du déchiffrement en ligne de commande : "process" (tous les cœurs) ou "thread"
+SCRUB_BATCH = 2000  # Entrées par lot (une mise à jour de la progression par lot)
+SCRUB_VERSION = 1
+
+def scrub_key(crypto):
+    """Sous-clé des empreintes, dérivée de la clé de données du coffre"""
+    return derive_subkey(crypto.key_bytes, b'scrub')
+
+def fingerprint(key, account, ciphertext):
+    """Empreinte de tout le chiffré (et du compte auquel il est lié)"""
+    digest = hashlib.blake2b(account.encode('utf-8'), digest_size=16, key=key)
+    digest.update(b'\0')
+    digest.update(ciphertext.encode('utf-8'))
+    return digest.hexdigest()
+
+class Scrubber:
+    def __init__(self, store, crypto, state_path=None, batch_size=SCRUB_BATCH, executor=None, max_workers=None):
+        """Vérifie les entrées du coffre ; l'état de la dernière passe est à côté (passwords.db.scrub)
+        
+        Une entrée est saine si elle se déchiffre (tag d'authentification, et
+        compte associé pour les moteurs AEAD) en un objet JSON. L'état garde l'empreinte des
+        entrées saines : en mode incrémental, seules les entrées ajoutées ou
+        modifiées depuis (et celles en erreur) sont revérifiées.
+        """
+        self.store = store
+        self.crypto = crypto
+        self.state_path = state_path or store.path + '.scrub'
+        self.batch_size = batch_size
+        self.executor = executor or SCRUB_EXECUTOR
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._progress = {'running': False}
+    
+    def _key_identifier(self, key):
+        return hmac.digest(key, b'key-id', 'sha256')[:8].hex()
+    
+    def _load_state(self, key_id):
+        """Empreintes vérifiées à la dernière passe (vide pour un autre coffre)"""
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r') as f:
+                document = json.load(f)
+            if document.get('version') == SCRUB_VERSION and document.get('key_id') == key_id:
+                return dict(document['verified'])
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Ignoring invalid scrub state {self.state_path}: {e}")
+        return {}
+    
+    def _verify(self, batch, executor):
+        """Déchiffre un lot ; retourne les erreurs par compte"""
+        plaintexts, errors = self.crypto.decrypt_many(batch, max_workers=self.max_workers, executor=executor, bind_keys=True)
+        for account, plaintext in plaintexts.items():
+            try:
+                if not isinstance(json.loads(plaintext), dict):
+                    errors[account] = "not a JSON object"
+            except ValueError:
+                errors[account] = "invalid JSON"
+        return errors
+    
+    def run(self, incremental=False, on_progress=None):
+        """Vérifie le coffre ; retourne le rapport (comptes corrompus ou indéchiffrables)"""
+        key = scrub_key(self.crypto)
+        key_id = self._key_identifier(key)
+        started = time.perf_counter()
+        ciphertexts = self.store.entries()
+        previous = self._load_state(key_id) if incremental else {}
+        
+        fingerprints = {}
+        pending = []
+        for account, ciphertext in ciphertexts.items():
+            if not isinstance(ciphertext, str):
+                continue
+            fingerprints[account] = fingerprint(key, account, ciphertext)
+            if previous.get(account) != fingerprints[account]:
+                pending.append(account)
+        corrupt = {account: "not a ciphertext" for account in ciphertexts if account not in fingerprints}
+        
+        with self._lock:
+            self._progress = {
+                'running': True,
+                'incremental': incremental,
+                'total': len(ciphertexts),
+                'skipped': len(fingerprints) - len(pending),
+                'to_check': len(pending),
+                'checked': 0,
+                'corrupt': dict(corrupt)
+            }
+        if on_progress:
+            on_progress(self.progress())
+        
+        # Pool de processus propre à la passe : démarré sans copier la mémoire du parent
+        # (spawn), puis arrêté pour que la clé transmise aux workers n'y survive pas
+        executor = self.executor
+        if executor == 'process':
+            executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            for start in range(0, len(pending), self.batch_size):
+                batch = {account: ciphertexts[account] for account in pending[start:start + self.batch_size]}
+                errors = self._verify(batch, executor)
+                corrupt.update(errors)
+                with self._lock:
+                    self._progress['checked'] += len(batch)
+                    self._progress['corrupt'].update(errors)
+                if on_progress:
+                    on_progress(self.progress())
+        finally:
+            if executor is not self.executor:
+                executor.shutdown()
+        
+        # Les entrées saines (revérifiées ou inchangées) servent de base à la prochaine passe
+        verified = {account: value for account, value in fingerprints.items() if account not in corrupt}
+        finished = datetime.datetime.now().isoformat(timespec='seconds')
+        try:
+            document = {'version': SCRUB_VERSION, 'key_id': key_id, 'finished': finished, 'verified': verified}
+            atomic_write(self.state_path, json.dumps(document, separators=(',', ':')).encode('utf-8'))
+        except Exception as e:
+            print(f"⚠️  Scrub state save error: {e}")
+        
+        with self._lock:
+            self._progress.update(running=False, finished=finished, elapsed=round(time.perf_counter() - started, 3))
+        report = self.progress()
+        if corrupt:
+            print(f"❌ Scrub: {len(corrupt)} corrupt entries out of {report['total']}")
+        else:
+            print(f"✅ Scrub: {report['checked']} entries verified, {report['skipped']} unchanged")
+        return report
+    
+    def progress(self):
+        """Copie de l'état de la passe en cours (ou de la dernière)"""
+        with self._lock:
+            progress = dict(self._progress)
+            if 'corrupt' in progress:
+                progress['corrupt'] = dict(progress['corrupt'])
+            return progress
+
+def print_progress(progress):
+    """Indicateur de progression sur une ligne (stderr)"""
+    done = progress['checked']
+    total = progress['to_check']
+    percent = 100 * done // total if total else 100
+    sys.stderr.write(f"\r🔍 Scrubbing {done}/{total} ({percent}%), {len(progress['corrupt'])} corrupt")
+    if done >= total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vérifie l'intégrité de chaque entrée du coffre")
+    parser.add_argument('--incremental', action='store_true', help="Seulement les entrées modifiées depuis la dernière vérification")
+    parser.add_argument('--executor', choices=['process', 'thread'], default=SCRUB_EXECUTOR)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help="Rapport JSON sur stdout")
+    args = parser.parse_args()
+    
+    store = open_store()
+    meta = store.load_meta()
+    if not is_initialized(meta):
+        print(f"❌ No vault in {store.path}")
+        sys.exit(2)
+    try:
+        crypto = unlock(meta, getpass.getpass("Master password: "))
+    except InvalidMasterPassword:
+        print("❌ Incorrect master password")
+        sys.exit(2)
+    
+    report = Scrubber(store, crypto, executor=args.executor, max_workers=args.workers).run(args.incremental, print_progress)
+    store.close()
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for account, error in report['corrupt'].items():
+            print(f"  ❌ {account}: {error}")
+    sys.exit(1 if report['corrupt'] else 0)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Index de recherche aveugle : un filtre de Bloom de jetons HMAC par entrée
+"""
+
+import hmac
+import json
+import os
+import re
+import threading
+import unicodedata
+from crypto import derive_subkey
+from storage import atomic_write
+
+SEARCH_FIELDS = ('username', 'url')  # Champs chiffrés indexés (le nom du compte est déjà en clair)
+BLOOM_HASHES = 3  # Bits par jeton, dans un filtre de 256 bits
+FINGERPRINT_LENGTH = 16  # Fin du chiffré indexé (tag d'authentification)
+INDEX_VERSION = 1
+
+def search_key(crypto):
+    """Sous-clé HMAC de l'index, dérivée de la clé de données du coffre"""
+    return derive_subkey(crypto.key_bytes, b'search-index')
+
+def normalize(text):
+    """Minuscules, sans accents ni espaces superflus"""
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.casefold().split())
+
+def text_tokens(text):
+    """Trigrammes et débuts de mots (2 caractères) d'un champ"""
+    text = normalize(text)
+    tokens = {text[i:i + 3] for i in range(len(text) - 2)}
+    tokens.update('^' + word[:2] for word in re.findall(r'\w+', text) if len(word) >= 2)
+    return tokens
+
+def query_tokens(query):
+    """Jetons qu'une entrée doit tous contenir ; vide si la requête est trop courte"""
+    query = normalize(query)
+    if len(query) >= 3:
+        return {query[i:i + 3] for i in range(len(query) - 2)}
+    if len(query) == 2:
+        return {'^' + query}
+    return set()
+
+def matches(query, account, data):
+    """Vérification exacte, une fois l'entrée déchiffrée
+    
+    Le nom du compte contient la requête, ou un champ indexé la contient
+    (à partir de 3 caractères) ou a un mot qui commence par elle (2 caractères).
+    """
+    query = normalize(query)
+    if query in normalize(account):
+        return True
+    if len(query) < 2:
+        return False
+    
+    for field in SEARCH_FIELDS:
+        value = normalize(data.get(field) or '')
+        if len(query) >= 3 and query in value:
+            return True
+        if len(query) == 2 and any(word.startswith(query) for word in re.findall(r'\w+', value)):
+            return True
+    return False
+
+def bloom(key, tokens):
+    """Filtre de 256 bits : BLOOM_HASHES octets du HMAC de chaque jeton"""
+    bits = 0
+    for token in tokens:
+        digest = hmac.digest(key, token.encode('utf-8'), 'sha256')
+        for byte in digest[:BLOOM_HASHES]:
+            bits |= 1 << byte
+    return bits
+
+class SearchIndex:
+    def __init__(self, path, save_delay=1.0):
+        """Index de recherche du coffre, à côté de lui (passwords.db.search)
+        
+        Les jetons sont des HMAC sous une sous-clé de la clé de données : le
+        fichier ne révèle pas les valeurs indexées. Chaque filtre garde la fin
+        du chiffré indexé ; une entrée modifiée ailleurs (autre appareil, ancien
+        client) n'est plus considérée comme indexée. Une recherche donne des
+        candidats, confirmés après déchiffrement. Données dérivées : le fichier
+        n'est pas synchronisé et se reconstruit en arrière-plan.
+        """
+        self.path = path
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Une écriture du fichier à la fois, dans l'ordre
+        self._key_id = None
+        self._entries = {}  # compte -> (empreinte du chiffré, filtre)
+        self._names = {}  # compte -> nom normalisé (filtre des noms en clair)
+        self._timer = None
+        self.indexed = 0
+        self.searches = 0
+        self.decrypted = 0
+    
+    def _key_identifier(self, key):
+        return hmac.digest(key, b'key-id', 'sha256')[:8].hex()
+    
+    def _use_key(self, key):
+        """Charge l'index de cette clé (un index d'un autre coffre est ignoré)"""
+        key_id = self._key_identifier(key)
+        if key_id == self._key_id:
+            return
+        
+        entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    document = json.load(f)
+                if document.get('version') == INDEX_VERSION and document.get('key_id') == key_id:
+                    entries = {account: (fingerprint, int(bits, 16)) for account, (fingerprint, bits) in document['entries'].items()}
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"⚠️  Ignoring invalid search index {self.path}: {e}")
+        self._key_id = key_id
+        self._entries = entries
+    
+    def missing(self, key, ciphertexts):
+        """Comptes absents de l'index ou indexés sur un autre chiffré"""
+        with self._lock:
+            self._use_key(key)
+            entries = self._entries
+            return [
+                account for account, ciphertext in ciphertexts.items()
+                if entries.get(account, ('',))[0] != ciphertext[-FINGERPRINT_LENGTH:]
+            ]
+    
+    def update(self, key, items):
+        """Indexe des entrées déchiffrées : {compte: (chiffré, données en clair)}"""
+        filters = {
+            account: (ciphertext[-FINGERPRINT_LENGTH:], bloom(key, set().union(*(text_tokens(data.get(field) or '') for field in SEARCH_FIELDS))))
+            for account, (ciphertext, data) in items.items()
+        }
+        with self._lock:
+            self._use_key(key)
+            self._entries.update(filters)
+            self.indexed += len(filters)
+            self._schedule_save()
+    
+    def remove(self, accounts):
+        with self._lock:
+            for account in accounts:
+                self._entries.pop(account, None)
+                self._names.pop(account, None)
+            self._schedule_save()
+    
+    def candidates(self, key, query, ciphertexts):
+        """(candidats selon les filtres, comptes non indexés) parmi ciphertexts"""
+        wanted = bloom(key, query_tokens(query))
+        found = []
+        unindexed = []
+        with self._lock:
+            self._use_key(key)
+            entries = self._entries
+            for account, ciphertext in ciphertexts.items():
+                entry = entries.get(account)
+                if entry is None or entry[0] != ciphertext[-FINGERPRINT_LENGTH:]:
+                    unindexed.append(account)
+                elif entry[1] & wanted == wanted:
+                    found.append(account)
+        return found, unindexed
+    
+    def search(self, view, query):
+        """Comptes correspondant à la requête, dans l'ordre du coffre
+        
+        Les noms sont filtrés en clair ; seuls les candidats de l'index (et les
+        entrées pas encore indexées) sont déchiffrés pour confirmation.
+        """
+        accounts = view.accounts()
+        normalized = normalize(query)
+        names = self._names
+        hits = set()
+        for account in accounts:
+            name = names.get(account)
+            if name is None:
+                name = names[account] = normalize(account)
+            if normalized in name:
+                hits.add(account)
+        if not query_tokens(query):
+            return [account for account in accounts if account in hits]
+        
+        key = search_key(view.crypto)
+        ciphertexts = view.store.get_many(accounts)
+        found, unindexed = self.candidates(key, query, ciphertexts)
+        to_check = [account for account in found + unindexed if account not in hits]
+        plaintexts, errors = view.get_many(to_check)
+        
+        # Les entrées déchiffrées pour la recherche sont indexées au passage
+        fresh = set(unindexed)
+        self.update(key, {account: (ciphertexts[account], data) for account, data in plaintexts.items() if account in fresh})
+        hits.update(account for account, data in plaintexts.items() if matches(query, account, data))
+        
+        with self._lock:
+            self.searches += 1
+            self.decrypted += len(plaintexts)
+        return [account for account in accounts if account in hits]
+    
+    def build(self, store, crypto, batch_size=500):
+        """Indexe en arrière-plan les entrées manquantes ; retourne le nombre d'entrées indexées
+        
+        Une entrée illisible (indéchiffrable, ou pas un objet JSON) reste hors de
+        l'index : la recherche la déchiffre, et l'ignore, comme la liste.
+        """
+        key = search_key(crypto)
+        ciphertexts = store.entries()
+        missing = self.missing(key, ciphertexts)
+        indexed = 0
+        unreadable = 0
+        for start in range(0, len(missing), batch_size):
+            batch = {account: ciphertexts[account] for account in missing[start:start + batch_size]}
+            plaintexts, errors = crypto.decrypt_many(batch, bind_keys=True)
+            items = {}
+            for account, plaintext in plaintexts.items():
+                try:
+                    data = json.loads(plaintext)
+                except ValueError:
+                    data = None
+                if isinstance(data, dict):
+                    items[account] = (batch[account], data)
+            self.update(key, items)
+            indexed += len(items)
+            unreadable += len(batch) - len(items)
+        if indexed:
+            print(f"✅ Search index: {indexed} entries indexed")
+        if unreadable:
+            print(f"⚠️  Search index: {unreadable} unreadable entries left unindexed")
+        return indexed
+    
+    def _schedule_save(self):
+        # Écritures regroupées : une rafale de modifications = une écriture
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def flush(self):
+        """Écrit l'index maintenant"""
+        with self._write_lock:
+            self._flush()
+    
+    def _flush(self):
+        with self._lock:
+            self._timer = None
+            if self._key_id is None:
+                return
+            document = {
+                'version': INDEX_VERSION,
+                'key_id': self._key_id,
+                'entries': {account: [fingerprint, f"{bits:064x}"] for account, (fingerprint, bits) in self._entries.items()}
+            }
+        try:
+            atomic_write(self.path, json.dumps(document, separators=(',', ':')).encode('utf-8'))
+        except Exception as e:
+            print(f"⚠️  Search index save error: {e}")
+    
+    def stats(self):
+        """Compteurs de l'index"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'indexed': self.indexed,
+                'searches': self.searches,
+                'decrypted': self.decrypted
+            }
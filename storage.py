@@ -0,0 +1,1256 @@
+#!/usr/bin/env python3
+"""
+Stockage du coffre : interface commune, backends fichier (JSON, journal, mmap, shards) et SQLite
+"""
+
+import contextlib
+import json
+import lzma
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+JSON_DB_FILE = "passwords.db"
+SQLITE_DB_FILE = "passwords.sqlite"
+SHARD_COUNT = 16
+
+# Conteneur binaire : MAGIC, version, compression, puis le corps
+# (méta-données JSON, nombre d'entrées, entrées compte/chiffré préfixées par leur longueur)
+BINARY_MAGIC = b'PMVB'
+BINARY_VERSION = 1
+BINARY_PREAMBLE = struct.Struct('>4sBB')
+LENGTH = struct.Struct('>I')
+COMPRESSIONS = {
+    'none': (0, lambda body: body, lambda body: body),
+    'zlib': (1, lambda body: zlib.compress(body, 6), zlib.decompress),
+    'lzma': (2, lzma.compress, lzma.decompress)
+}
+DECOMPRESSORS = {code: decompress for code, _, decompress in COMPRESSIONS.values()}
+
+def encode_document(data, file_format='json', compression='none'):
+    """Sérialise le document : JSON historique (indenté) ou conteneur binaire"""
+    if file_format == 'json':
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    if file_format != 'binary':
+        raise ValueError(f"Unknown vault format: {file_format}")
+    
+    code, compress, _ = COMPRESSIONS[compression]
+    return BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, code) + compress(b''.join(binary_body(data)))
+
+def binary_body(data):
+    """Corps du conteneur binaire, morceau par morceau (écriture en flux)"""
+    meta = json.dumps({k: v for k, v in data.items() if k != 'passwords'}, separators=(',', ':')).encode('utf-8')
+    passwords = data.get('passwords', {})
+    yield LENGTH.pack(len(meta)) + meta + LENGTH.pack(len(passwords))
+    for account, ciphertext in passwords.items():
+        account, ciphertext = account.encode('utf-8'), ciphertext.encode('utf-8')
+        yield LENGTH.pack(len(account)) + account + LENGTH.pack(len(ciphertext)) + ciphertext
+
+def decode_document(payload):
+    """Désérialise un document ; le format est détecté par les premiers octets"""
+    if not payload.startswith(BINARY_MAGIC):
+        return json.loads(payload.decode('utf-8'))
+    
+    _, version, code = BINARY_PREAMBLE.unpack_from(payload)
+    if version != BINARY_VERSION or code not in DECOMPRESSORS:
+        raise ValueError(f"Unsupported vault container (version {version}, compression {code})")
+    body = DECOMPRESSORS[code](payload[BINARY_PREAMBLE.size:])
+    
+    unpack = LENGTH.unpack_from
+    (length,) = unpack(body, 0)
+    offset = 4 + length
+    data = json.loads(body[4:offset].decode('utf-8'))
+    (count,) = unpack(body, offset)
+    offset += 4
+    
+    passwords = {}
+    for _ in range(count):
+        (length,) = unpack(body, offset)
+        offset += 4
+        account = body[offset:offset + length].decode('utf-8')
+        offset += length
+        (length,) = unpack(body, offset)
+        offset += 4
+        passwords[account] = body[offset:offset + length].decode('utf-8')
+        offset += length
+    data['passwords'] = passwords
+    return data
+
+def index_binary(buffer):
+    """Méta-données et index {compte: offset} d'un conteneur non compressé
+    
+    L'offset pointe sur la longueur du chiffré, suivie du chiffré lui-même.
+    Seuls les noms de comptes sont décodés ; ValueError si le buffer n'est pas
+    un conteneur binaire sans compression.
+    """
+    if buffer[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("Not a binary vault container")
+    _, version, code = BINARY_PREAMBLE.unpack_from(buffer)
+    if version != BINARY_VERSION or code != COMPRESSIONS['none'][0]:
+        raise ValueError(f"Vault container cannot be indexed (version {version}, compression {code})")
+    
+    unpack = LENGTH.unpack_from
+    offset = BINARY_PREAMBLE.size
+    (length,) = unpack(buffer, offset)
+    offset += 4 + length
+    meta = json.loads(buffer[offset - length:offset].decode('utf-8'))
+    (count,) = unpack(buffer, offset)
+    offset += 4
+    
+    index = {}
+    for _ in range(count):
+        (length,) = unpack(buffer, offset)
+        offset += 4
+        account = buffer[offset:offset + length].decode('utf-8')
+        offset += length
+        index[account] = offset
+        (length,) = unpack(buffer, offset)
+        offset += 4 + length
+    if offset > len(buffer):
+        raise ValueError("Truncated vault container")
+    return meta, index
+
+def atomic_write(path, payload, before_replace=None):
+    """Écrit un fichier complet ou rien : fichier temporaire, fsync, rename
+    
+    payload est un bytes ou un itérable de morceaux (écriture en flux).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(payload, (bytes, bytearray)):
+                f.write(payload)
+            else:
+                f.writelines(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if before_replace:
+            before_replace()
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    
+    # Rend le rename durable (impossible sous Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Verrou exclusif entre processus (et entre threads), sur un fichier qui n'est jamais remplacé"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK abandonne après 10 s : on réessaie
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def apply_record(data, record):
+    """Applique une mutation (put, delete, meta, reset) au document, en place"""
+    op = record['op']
+    if op == 'put':
+        data.setdefault('passwords', {})[record['account']] = record['data']
+    elif op == 'delete':
+        data.get('passwords', {}).pop(record['account'], None)
+    elif op == 'meta':
+        passwords = data.get('passwords', {})
+        data.clear()
+        data.update(record['meta'])
+        data['passwords'] = passwords
+    elif op == 'reset':
+        data.clear()
+        data.update(record['document'])
+        data['passwords'] = dict(record['document'].get('passwords', {}))
+    else:
+        raise ValueError(f"Unknown vault record: {op}")
+
+def apply_records(data, records):
+    """Nouveau document : data (non modifié) avec les records appliqués"""
+    resets = [i for i, record in enumerate(records) if record['op'] == 'reset']
+    if resets:
+        data, records = {}, records[resets[-1]:]
+    data = {**data, 'passwords': dict(data.get('passwords', {}))}
+    for record in records:
+        apply_record(data, record)
+    return data
+
+class _BatchState:
+    def __init__(self, data):
+        """Document lu + records déjà acceptés dans le lot, sans copier le document"""
+        self._data = data
+        self._entries = {}  # compte -> entrée chiffrée, None si supprimée
+    
+    def entry(self, account):
+        """Entrée chiffrée courante d'un compte, ou None"""
+        if account in self._entries:
+            return self._entries[account]
+        return self._data.get('passwords', {}).get(account)
+    
+    def apply(self, records):
+        for record in records:
+            if record['op'] == 'put':
+                self._entries[record['account']] = record['data']
+            elif record['op'] == 'delete':
+                self._entries[record['account']] = None
+            elif record['op'] == 'reset':
+                self._data = record['document']
+                self._entries = {}
+
+class _PendingWrite:
+    def __init__(self, mutation):
+        self.mutation = mutation
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class GroupCommit:
+    def __init__(self, read, write, window=0.005):
+        """Regroupe les écritures concurrentes en une seule écriture durable
+        
+        Le premier appelant devient meneur : il attend `window` secondes, évalue
+        toutes les mutations reçues entre-temps, puis écrit une fois via
+        write(records). Chaque appelant est rendu après l'écriture qui contient
+        sa mutation.
+        """
+        self._read = read
+        self._write = write
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = []
+        self._leader_active = False
+        self.mutations = 0
+        self.writes = 0
+    
+    def submit(self, mutation):
+        """mutation(état) -> (résultat, records) ; retourne le résultat une fois écrit
+        
+        état.entry(compte) donne l'entrée courante, mutations précédentes du lot comprises.
+        """
+        request = _PendingWrite(mutation)
+        with self._lock:
+            self._pending.append(request)
+            leader = not self._leader_active
+            self._leader_active = True
+        
+        if leader:
+            if self.window:
+                time.sleep(self.window)
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._leader_active = False
+                        break
+                self._commit(batch)
+        
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+    
+    def _commit(self, batch):
+        try:
+            # Le document lu reste partagé avec les lecteurs : rien n'est copié ici
+            state = _BatchState(self._read())
+            records = []
+            for request in batch:
+                try:
+                    request.result, changes = request.mutation(state)
+                except Exception as e:
+                    request.error = e
+                    continue
+                state.apply(changes)
+                records.extend(changes)
+            if records:
+                self._write(records)
+        except Exception as e:
+            for request in batch:
+                request.error = request.error or e
+        finally:
+            with self._lock:
+                self.mutations += len(batch)
+                self.writes += 1
+            for request in batch:
+                request.done.set()
+
+class VaultStore:
+    """Interface de stockage utilisée par les deux front-ends
+    
+    Le document d'un coffre est {**meta, 'passwords': {compte: entrée chiffrée}},
+    les méta-données regroupant l'en-tête et les champs historiques (auth_token).
+    """
+    
+    path = None
+    
+    def load(self):
+        """Document complet ; {} si le coffre n'existe pas"""
+        meta = self.load_meta()
+        if not meta:
+            return {}
+        return {**meta, 'passwords': self.entries()}
+    
+    def save(self, data):
+        """Remplace tout le coffre (création, import)"""
+        raise NotImplementedError
+    
+    def load_meta(self):
+        """Méta-données du coffre (en-tête, auth_token...) ; {} si absent"""
+        raise NotImplementedError
+    
+    def save_meta(self, meta):
+        """Remplace les méta-données sans toucher aux entrées"""
+        raise NotImplementedError
+    
+    def entries(self):
+        """Toutes les entrées {compte: entrée chiffrée}"""
+        raise NotImplementedError
+    
+    def accounts(self):
+        """Noms des comptes, sans lire les entrées"""
+        return list(self.entries())
+    
+    def get(self, account):
+        """Entrée chiffrée d'un compte, ou None"""
+        return self.entries().get(account)
+    
+    def get_many(self, accounts):
+        """Entrées chiffrées des comptes demandés (les absents sont omis)"""
+        entries = self.entries()
+        return {account: entries[account] for account in accounts if account in entries}
+    
+    def put(self, account, ciphertext):
+        """Ajoute ou remplace une entrée"""
+        self.put_many({account: ciphertext})
+    
+    def put_many(self, entries, expected=None):
+        """Ajoute ou remplace plusieurs entrées en une écriture
+        
+        Avec `expected` ({compte: ancienne valeur}), une entrée n'est écrite que
+        si elle n'a pas changé entre-temps ; retourne le nombre d'entrées écrites.
+        """
+        raise NotImplementedError
+    
+    def delete(self, account):
+        """Supprime une entrée ; retourne True si elle existait"""
+        raise NotImplementedError
+    
+    def flush(self):
+        """Rend les fichiers du coffre complets sur disque (avant upload)"""
+    
+    def sync_paths(self):
+        """Fichiers à synchroniser, le fichier principal en premier"""
+        return [self.path]
+    
+    def referenced_paths(self):
+        """Fichiers annexes listés par le fichier principal (à ne jamais supprimer)"""
+        return []
+    
+    def migrate(self):
+        """Convertit le coffre local au format du stockage (après un download)"""
+    
+    def close(self):
+        """Libère le fichier (avant de le remplacer par un download)"""
+    
+    def stats(self):
+        """Compteurs du stockage"""
+        return {'backend': type(self).__name__, 'path': self.path}
+
+class JsonVaultStore(VaultStore):
+    def __init__(self, path=JSON_DB_FILE, commit_window=0.005, file_format='json', compression='none'):
+        """Fichier JSON historique : chaque écriture réécrit tout le fichier
+        
+        Le document parsé est gardé en mémoire et revalidé par un stat() :
+        il n'est relu que si un autre processus (GUI, download) a changé le fichier.
+        Les écritures sont atomiques et regroupées (une seule par rafale).
+        file_format='binary' écrit le conteneur binaire ; la lecture détecte le format.
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.path = path
+        self.file_format = file_format
+        self.compression = compression
+        self._lock = threading.RLock()
+        self._snapshot = None  # (signature du fichier, document) ; jamais modifié en place
+        self.hits = 0
+        self.reloads = 0
+        self._writer = GroupCommit(self._read, self._write, commit_window)
+    
+    def _signature(self):
+        """Identité du contenu du fichier ; None s'il n'existe pas"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _read(self):
+        """Document courant, en lecture seule (partagé avec le cache)"""
+        with self._lock:
+            signature = self._signature()
+            if signature is None:
+                self._snapshot = None
+                return {}
+            
+            if self._snapshot and self._snapshot[0] == signature:
+                self.hits += 1
+                return self._snapshot[1]
+            
+            data = self._load_document()
+            self._snapshot = (signature, data)
+            self.reloads += 1
+            return data
+    
+    def _load_document(self):
+        with open(self.path, 'rb') as f:
+            return decode_document(f.read())
+    
+    def _encode(self, data):
+        return encode_document(data, self.file_format, self.compression)
+    
+    def _write(self, records):
+        """Réécrit tout le document avec les records appliqués"""
+        data = apply_records(self._read(), records)
+        payload = self._encode(data)
+        with self._lock:
+            atomic_write(self.path, payload)
+            self._snapshot = (self._signature(), data)
+    
+    def invalidate(self):
+        """Oublie le document en mémoire"""
+        with self._lock:
+            self._snapshot = None
+    
+    def load(self):
+        data = self._read()
+        return {**data, 'passwords': dict(data.get('passwords', {}))} if data else {}
+    
+    def save(self, data):
+        document = {**data, 'passwords': dict(data.get('passwords', {}))}
+        self._writer.submit(lambda state: (None, [{'op': 'reset', 'document': document}]))
+    
+    def load_meta(self):
+        return {k: v for k, v in self._read().items() if k != 'passwords'}
+    
+    def save_meta(self, meta):
+        meta = {k: v for k, v in meta.items() if k != 'passwords'}
+        self._writer.submit(lambda state: (None, [{'op': 'meta', 'meta': meta}]))
+    
+    def entries(self):
+        return dict(self._read().get('passwords', {}))
+    
+    def accounts(self):
+        return list(self._read().get('passwords', {}))
+    
+    def get(self, account):
+        return self._read().get('passwords', {}).get(account)
+    
+    def get_many(self, accounts):
+        passwords = self._read().get('passwords', {})
+        return {account: passwords[account] for account in accounts if account in passwords}
+    
+    def put_many(self, entries, expected=None):
+        entries = dict(entries)
+        
+        def mutation(state):
+            if expected is not None:
+                entries_to_write = {a: c for a, c in entries.items() if state.entry(a) == expected.get(a)}
+            else:
+                entries_to_write = entries
+            records = [{'op': 'put', 'account': a, 'data': c} for a, c in entries_to_write.items()]
+            return len(records), records
+        
+        return self._writer.submit(mutation)
+    
+    def delete(self, account):
+        def mutation(state):
+            if state.entry(account) is None:
+                return False, []
+            return True, [{'op': 'delete', 'account': account}]
+        
+        return self._writer.submit(mutation)
+    
+    def close(self):
+        self.invalidate()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                **super().stats(),
+                'cache_hits': self.hits,
+                'reloads': self.reloads,
+                'mutations': self._writer.mutations,
+                'writes': self._writer.writes
+            }
+
+class JournalVaultStore(JsonVaultStore):
+    def __init__(self, path=JSON_DB_FILE, commit_window=0.005, file_format='json', compression='none',
+                 max_journal_bytes=1024 * 1024, max_journal_records=1000):
+        """Snapshot (JSON ou binaire) + journal append-only des mutations (passwords.db.journal)
+        
+        Une écriture est un seul append ; le chargement rejoue le journal sur le
+        snapshot ; un compacteur en arrière-plan replie le journal dans le
+        snapshot au-delà de max_journal_bytes ou max_journal_records.
+        Plusieurs processus (GUI et web app) peuvent écrire dans le même coffre :
+        appends, resets et remplacement par la compaction se font sous un verrou
+        de fichier (passwords.db.journal.lock).
+        """
+        super().__init__(path, commit_window, file_format, compression)
+        self.journal_path = path + '.journal'
+        self.lock_path = self.journal_path + '.lock'
+        self.max_journal_bytes = max_journal_bytes
+        self.max_journal_records = max_journal_records
+        self._journal_bytes = 0  # Longueur valide (un record tronqué par un crash est ignoré)
+        self._journal_records = 0
+        self._generation = 0  # +1 à chaque rechargement ou reset : le document a pu changer entièrement
+        self._compacting = False
+        self.appends = 0
+        self.compactions = 0
+    
+    def _signature(self):
+        snapshot = super()._signature()
+        if snapshot is None:
+            return None
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return (snapshot, None)
+        return (snapshot, (st.st_mtime_ns, st.st_size, st.st_ino))
+    
+    def _load_document(self):
+        data = super()._load_document()
+        data['passwords'] = dict(data.get('passwords', {}))
+        for record in self._replay_journal():
+            apply_record(data, record)
+        return data
+    
+    def _replay_journal(self):
+        """Records valides du journal, dans l'ordre ; s'arrête au premier record tronqué"""
+        self._journal_bytes = 0
+        self._journal_records = 0
+        self._generation += 1
+        if not os.path.exists(self.journal_path):
+            return
+        
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                record = self._decode_record(line)
+                if record is None:
+                    print(f"⚠️  Ignoring truncated journal tail in {self.journal_path}")
+                    break
+                self._journal_bytes += len(line)
+                self._journal_records += 1
+                yield record
+    
+    def _scan_tail(self, offset):
+        """(records valides du journal après offset, leur taille)"""
+        records = []
+        size = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    record = self._decode_record(line)
+                    if record is None:
+                        break
+                    records.append(record)
+                    size += len(line)
+        except FileNotFoundError:
+            pass
+        return records, size
+    
+    def _encode_record(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return b'%08x %s\n' % (zlib.crc32(line), line)
+    
+    def _decode_record(self, line):
+        """Record d'une ligne du journal, ou None s'il est incomplet ou corrompu"""
+        if not line.endswith(b'\n') or len(line) < 10:
+            return None
+        crc, payload = line[:8], line[9:-1]
+        try:
+            if int(crc, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+    
+    def _applied(self, data, records):
+        """Document après les records (pour le cache en mémoire)"""
+        return apply_records(data, records)
+    
+    def _replace_snapshot(self, payload):
+        atomic_write(self.path, payload)
+    
+    def _write(self, records):
+        base = self._read()
+        generation = self._generation
+        data = self._applied(base, records)
+        
+        # Un remplacement complet (création, import) passe par le snapshot
+        if any(record['op'] == 'reset' for record in records):
+            with file_lock(self.lock_path), self._lock:
+                self._replace_snapshot(self._encode(data))
+                atomic_write(self.journal_path, b'')
+                self._journal_bytes = 0
+                self._journal_records = 0
+                self._generation += 1
+                self._snapshot = (self._signature(), data)
+            return
+        
+        payload = b''.join(self._encode_record(record) for record in records)
+        # Verrou de fichier d'abord, puis celui du processus (même ordre partout)
+        with file_lock(self.lock_path), self._lock:
+            # Un autre processus (GUI) a pu écrire depuis la lecture : coffre rechargé,
+            # puis records ajoutés entre le stat() et l'append, gardés devant les nôtres
+            base = self._read()
+            if self._generation != generation:
+                data = self._applied(base, records)
+            foreign, size = self._scan_tail(self._journal_bytes)
+            if foreign:
+                data = self._applied(base, foreign + records)
+                self._journal_bytes += size
+                self._journal_records += len(foreign)
+            
+            with open(self.journal_path, 'ab') as f:
+                if f.tell() > self._journal_bytes:
+                    # Ce qui reste vient d'être vérifié : un record tronqué par un crash
+                    f.truncate(self._journal_bytes)
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_bytes += len(payload)
+            self._journal_records += len(records)
+            self.appends += 1
+            self._snapshot = (self._signature(), data)
+            
+            compact = not self._compacting and (
+                self._journal_bytes >= self.max_journal_bytes
+                or self._journal_records >= self.max_journal_records
+            )
+            if compact:
+                self._compacting = True
+        if compact:
+            threading.Thread(target=self.compact, daemon=True).start()
+    
+    def compact(self):
+        """Replie le journal dans le snapshot sans bloquer les appends pendant l'encodage"""
+        try:
+            with self._lock:
+                data = self._read()
+                base = self._files()
+                offset, records = self._journal_bytes, self._journal_records
+            payload = self._encode(data)
+            
+            # Aucun append ni reset, de ce processus ou d'un autre, pendant le remplacement
+            with file_lock(self.lock_path), self._lock:
+                # Snapshot ou journal remplacé pendant l'encodage (reset, autre compaction) :
+                # le snapshot encodé est périmé. Des appends seuls le laissent valable.
+                if self._files() != base:
+                    print(f"ℹ️  Journal compaction of {self.path} skipped: vault replaced meanwhile")
+                    return
+                
+                # Tout ce qui suit offset, de ce processus ou d'un autre, reste dans le journal
+                tail_records, size = self._scan_tail(offset)
+                tail = b''
+                if size:
+                    with open(self.journal_path, 'rb') as f:
+                        f.seek(offset)
+                        tail = f.read(size)
+                
+                # Ordre sûr : snapshot d'abord ; rejouer l'ancien journal dessus est idempotent
+                self._replace_snapshot(payload)
+                atomic_write(self.journal_path, tail)
+                if self._snapshot and offset + size == self._journal_bytes:
+                    self._journal_bytes = size
+                    self._journal_records = len(tail_records)
+                    self._snapshot = (self._signature(), self._snapshot[1])
+                else:
+                    # Records d'un autre processus pas encore lus ici : relu au prochain accès
+                    self._snapshot = None
+                self.compactions += 1
+            print(f"✅ Compacted {records} journal records into {self.path}")
+        except Exception as e:
+            print(f"⚠️  Journal compaction error: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+    
+    def _files(self):
+        """Identité du snapshot et du journal (hors appends) : change s'ils sont remplacés"""
+        try:
+            journal = os.stat(self.journal_path).st_ino
+        except FileNotFoundError:
+            journal = None
+        return (JsonVaultStore._signature(self), journal)
+    
+    def sync_paths(self):
+        return [self.path, self.journal_path]
+    
+    def stats(self):
+        with self._lock:
+            return {
+                **super().stats(),
+                'journal_bytes': self._journal_bytes,
+                'journal_records': self._journal_records,
+                'appends': self.appends,
+                'compactions': self.compactions
+            }
+
+class _MappedEntries(Mapping):
+    def __init__(self, buffer, index, overlay=None):
+        """Entrées {compte: chiffré} lues à la demande dans le snapshot mappé
+        
+        overlay ({compte: chiffré, None si supprimé}) porte les mutations du
+        journal ; il n'est jamais modifié en place.
+        """
+        self._buffer = buffer
+        self._index = index
+        self._overlay = overlay or {}
+        self._length = len(index)
+        for account, ciphertext in self._overlay.items():
+            if account in index:
+                self._length -= ciphertext is None
+            else:
+                self._length += ciphertext is not None
+    
+    def __getitem__(self, account):
+        if account in self._overlay:
+            ciphertext = self._overlay[account]
+            if ciphertext is None:
+                raise KeyError(account)
+            return ciphertext
+        
+        offset = self._index[account]
+        (length,) = LENGTH.unpack_from(self._buffer, offset)
+        return self._buffer[offset + 4:offset + 4 + length].decode('utf-8')
+    
+    def __contains__(self, account):
+        if account in self._overlay:
+            return self._overlay[account] is not None
+        return account in self._index
+    
+    def __iter__(self):
+        overlay = self._overlay
+        for account in self._index:
+            if overlay.get(account, account) is not None:
+                yield account
+        for account, ciphertext in overlay.items():
+            if ciphertext is not None and account not in self._index:
+                yield account
+    
+    def __len__(self):
+        return self._length
+    
+    def updated(self, records):
+        """Nouvelle vue avec les puts/deletes des records dans la surcouche"""
+        overlay = dict(self._overlay)
+        for record in records:
+            if record['op'] == 'put':
+                overlay[record['account']] = record['data']
+            elif record['op'] == 'delete':
+                overlay[record['account']] = None
+        return _MappedEntries(self._buffer, self._index, overlay)
+
+class MmapVaultStore(JournalVaultStore):
+    def __init__(self, path=JSON_DB_FILE, commit_window=0.005,
+                 max_journal_bytes=1024 * 1024, max_journal_records=1000):
+        """Snapshot binaire non compressé lu par mmap + journal des mutations
+        
+        Seul l'index compte -> offset est en mémoire : lire une entrée est une
+        tranche du mapping, sans parser le document, et la mémoire ne dépend
+        pas de la taille des entrées. Le journal forme une petite surcouche,
+        repliée par la compaction. Un coffre JSON ou compressé est converti au
+        premier chargement.
+        """
+        super().__init__(path, commit_window, 'binary', 'none', max_journal_bytes, max_journal_records)
+        self._map = None
+    
+    def _load_document(self):
+        with open(self.path, 'rb') as f:
+            mappable = f.read(BINARY_PREAMBLE.size) == BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, 0)
+            if mappable:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                f.seek(0)
+                document = decode_document(f.read())
+        
+        if mappable:
+            meta, index = index_binary(buffer)
+            self._map = buffer
+            entries = _MappedEntries(buffer, index)
+        else:
+            # Ancien format : gardé en surcouche le temps que la compaction le convertisse
+            print(f"ℹ️  Converting {self.path} to the indexed binary container")
+            meta = {k: v for k, v in document.items() if k != 'passwords'}
+            entries = _MappedEntries(b'', {}, dict(document.get('passwords', {})))
+            if not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, daemon=True).start()
+        
+        return self._applied({**meta, 'passwords': entries}, list(self._replay_journal()))
+    
+    def _encode(self, data):
+        # En flux : la compaction ne matérialise pas le coffre en mémoire
+        yield BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, 0)
+        yield from binary_body(data)
+    
+    def _applied(self, data, records):
+        passwords = data.get('passwords')
+        if not isinstance(passwords, _MappedEntries) or any(record['op'] == 'reset' for record in records):
+            return apply_records(data, records)
+        
+        meta = {k: v for k, v in data.items() if k != 'passwords'}
+        for record in records:
+            if record['op'] == 'meta':
+                meta = dict(record['meta'])
+        return {**meta, 'passwords': passwords.updated(records)}
+    
+    def _replace_snapshot(self, payload):
+        atomic_write(self.path, payload, before_replace=self._release_map)
+    
+    def _release_map(self):
+        """Oublie le mapping courant ; le prochain accès mappe le nouveau snapshot"""
+        # Windows refuse de remplacer un fichier mappé ; ailleurs l'ancien
+        # mapping reste lisible par les lecteurs en cours
+        if os.name == 'nt' and self._map is not None:
+            self._map.close()
+        self._map = None
+        self._snapshot = None
+    
+    def _write(self, records):
+        super()._write(records)
+        if any(record['op'] == 'reset' for record in records):
+            # Le document écrit est en mémoire : on repasse par le mapping
+            self.invalidate()
+    
+    def close(self):
+        # Comme au remplacement du snapshot : les documents déjà rendus gardent leur
+        # mapping, libéré par le ramasse-miettes quand plus personne ne le lit
+        with self._lock:
+            self._release_map()
+    
+    def stats(self):
+        with self._lock:
+            passwords = self._snapshot[1].get('passwords') if self._snapshot else None
+            return {
+                **super().stats(),
+                'mapped_bytes': len(self._map) if self._map is not None else 0,
+                'overlay_entries': len(passwords._overlay) if isinstance(passwords, _MappedEntries) else 0
+            }
+
+class ShardedVaultStore(VaultStore):
+    def __init__(self, path=JSON_DB_FILE, shards=SHARD_COUNT, commit_window=0.005, file_format='json', compression='none'):
+        """Manifeste (passwords.db) + N fichiers de shards (passwords.db.shard-NN)
+        
+        Une entrée est rangée dans le shard crc32(compte) % N : une modification
+        ne réécrit que son shard et le manifeste, qui porte les méta-données et
+        l'empreinte de chaque shard. Un coffre en fichier unique est découpé au
+        premier accès ; un coffre déjà découpé garde son nombre de shards.
+        """
+        self.path = path
+        self.shards = shards
+        self.commit_window = commit_window
+        self.file_format = file_format
+        self.compression = compression
+        self._manifest = JsonVaultStore(path, commit_window)
+        self._stores = {}
+        self._lock = threading.RLock()
+        self._checked = None  # Signature du manifeste dont les shards ont été vérifiés
+    
+    def shard_path(self, index):
+        return f"{self.path}.shard-{index:02d}"
+    
+    def _shard(self, index):
+        with self._lock:
+            if index not in self._stores:
+                self._stores[index] = JsonVaultStore(self.shard_path(index), self.commit_window, self.file_format, self.compression)
+            return self._stores[index]
+    
+    def _digest(self, index):
+        """Empreinte du fichier d'un shard (None s'il n'existe pas)"""
+        try:
+            with open(self.shard_path(index), 'rb') as f:
+                return f"{zlib.crc32(f.read()):08x}"
+        except FileNotFoundError:
+            return None
+    
+    def _count(self):
+        """Nombre de shards du coffre ; découpe un coffre en fichier unique au premier accès"""
+        with self._lock:
+            document = self._manifest._read()
+            if not document:
+                return self.shards
+            
+            if 'shards' not in document:
+                self._split()
+                document = self._manifest._read()
+            
+            count = document['shards']['count']
+            signature = self._manifest._signature()
+            if signature != self._checked:
+                # Manifeste venu d'ailleurs (download) : shards synchronisés avec lui ?
+                self._checked = signature
+                for index, digest in enumerate(document['shards']['digests']):
+                    if self._digest(index) != digest:
+                        print(f"⚠️  {self.shard_path(index)} does not match the manifest (incomplete sync?)")
+            return count
+    
+    def _split(self):
+        # Le journal éventuel est rejoué avant découpe, puis n'a plus de raison d'être
+        document = JournalVaultStore(self.path).load()
+        self._save(document, self.shards)
+        if os.path.exists(self.path + '.journal'):
+            os.remove(self.path + '.journal')
+        print(f"✅ Split {self.path} into {self.shards} shards")
+    
+    def _index(self, account, count):
+        return zlib.crc32(account.encode('utf-8')) % count
+    
+    def _group(self, accounts, count):
+        groups = {}
+        for account in accounts:
+            groups.setdefault(self._index(account, count), []).append(account)
+        return groups
+    
+    def _save(self, data, count):
+        parts = [{} for _ in range(count)]
+        for account, ciphertext in data.get('passwords', {}).items():
+            parts[self._index(account, count)][account] = ciphertext
+        
+        # Shards d'abord : tant que le manifeste n'est pas écrit, l'ancien coffre fait foi
+        for index, part in enumerate(parts):
+            self._shard(index).save({'passwords': part})
+        meta = {k: v for k, v in data.items() if k not in ('passwords', 'shards')}
+        layout = {'count': count, 'digests': [self._digest(index) for index in range(count)]}
+        self._manifest.save({**meta, 'shards': layout})
+        self._checked = self._manifest._signature()
+    
+    def _touched(self, indexes):
+        """Met à jour l'empreinte des shards réécrits dans le manifeste"""
+        with self._lock:
+            meta = self._manifest.load_meta()
+            layout = dict(meta['shards'])
+            layout['digests'] = list(layout['digests'])
+            for index in indexes:
+                layout['digests'][index] = self._digest(index)
+            self._manifest.save_meta({**meta, 'shards': layout})
+            self._checked = self._manifest._signature()
+    
+    def save(self, data):
+        with self._lock:
+            document = self._manifest._read()
+            count = document['shards']['count'] if 'shards' in document else self.shards
+            self._save(data, count)
+    
+    def load_meta(self):
+        self._count()
+        return {k: v for k, v in self._manifest.load_meta().items() if k != 'shards'}
+    
+    def save_meta(self, meta):
+        with self._lock:
+            self._count()
+            layout = self._manifest.load_meta()['shards']
+            meta = {k: v for k, v in meta.items() if k not in ('passwords', 'shards')}
+            self._manifest.save_meta({**meta, 'shards': layout})
+            self._checked = self._manifest._signature()
+    
+    def entries(self):
+        entries = {}
+        for index in range(self._count()):
+            entries.update(self._shard(index).entries())
+        return entries
+    
+    def accounts(self):
+        accounts = []
+        for index in range(self._count()):
+            accounts.extend(self._shard(index).accounts())
+        return accounts
+    
+    def get(self, account):
+        return self._shard(self._index(account, self._count())).get(account)
+    
+    def get_many(self, accounts):
+        accounts = list(accounts)
+        found = {}
+        for index, group in self._group(accounts, self._count()).items():
+            found.update(self._shard(index).get_many(group))
+        return {account: found[account] for account in accounts if account in found}
+    
+    def put_many(self, entries, expected=None):
+        written = 0
+        touched = []
+        for index, group in self._group(entries, self._count()).items():
+            count = self._shard(index).put_many({account: entries[account] for account in group}, expected)
+            if count:
+                written += count
+                touched.append(index)
+        if touched:
+            self._touched(touched)
+        return written
+    
+    def delete(self, account):
+        index = self._index(account, self._count())
+        deleted = self._shard(index).delete(account)
+        if deleted:
+            self._touched([index])
+        return deleted
+    
+    def sync_paths(self):
+        # Sans découpe : après un download, le coffre n'est converti que par migrate()
+        with self._lock:
+            document = self._manifest._read()
+        if document and 'shards' not in document:
+            return [self.path, self.path + '.journal']
+        count = document['shards']['count'] if document else self.shards
+        return [self.path] + [self.shard_path(index) for index in range(count)]
+    
+    def referenced_paths(self):
+        with self._lock:
+            document = self._manifest._read()
+        if not document or 'shards' not in document:
+            return []
+        return [self.shard_path(index) for index in range(document['shards']['count'])]
+    
+    def migrate(self):
+        with self._lock:
+            document = self._manifest._read()
+            if document and 'shards' not in document:
+                self._split()
+    
+    def close(self):
+        with self._lock:
+            self._manifest.invalidate()
+            for store in self._stores.values():
+                store.invalidate()
+    
+    def stats(self):
+        return {
+            **super().stats(),
+            'shards': self._count(),
+            'shard_writes': sum(store._writer.writes for store in self._stores.values()),
+            'manifest_writes': self._manifest._writer.writes
+        }
+
+class SqliteVaultStore(VaultStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            account TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_entries_account ON entries(account);
+    """
+    
+    def __init__(self, path=SQLITE_DB_FILE):
+        """Base SQLite (WAL) : une ligne par entrée, une écriture par modification"""
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+    
+    def _connection(self):
+        """Connexion ouverte à la demande (fermée avant un download Dropbox)"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+    
+    def save(self, data):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM meta")
+                conn.execute("DELETE FROM entries")
+                self._insert_meta(conn, {k: v for k, v in data.items() if k != 'passwords'})
+                conn.executemany(
+                    "INSERT INTO entries (account, data) VALUES (?, ?)",
+                    data.get('passwords', {}).items()
+                )
+    
+    def load_meta(self):
+        with self._lock:
+            rows = self._connection().execute("SELECT key, value FROM meta").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+    
+    def save_meta(self, meta):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM meta")
+                self._insert_meta(conn, meta)
+    
+    def _insert_meta(self, conn, meta):
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in meta.items()]
+        )
+    
+    def entries(self):
+        with self._lock:
+            rows = self._connection().execute("SELECT account, data FROM entries ORDER BY id").fetchall()
+        return dict(rows)
+    
+    def accounts(self):
+        with self._lock:
+            rows = self._connection().execute("SELECT account FROM entries ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+    
+    def get(self, account):
+        with self._lock:
+            row = self._connection().execute("SELECT data FROM entries WHERE account = ?", (account,)).fetchone()
+        return row[0] if row else None
+    
+    def get_many(self, accounts):
+        accounts = list(accounts)
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            # Par lots : SQLite limite le nombre de paramètres d'une requête
+            for start in range(0, len(accounts), 500):
+                chunk = accounts[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(conn.execute(f"SELECT account, data FROM entries WHERE account IN ({placeholders})", chunk))
+        return {account: found[account] for account in accounts if account in found}
+    
+    def put_many(self, entries, expected=None):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if expected is None:
+                    cursor = conn.executemany(
+                        "INSERT INTO entries (account, data) VALUES (?, ?) "
+                        "ON CONFLICT(account) DO UPDATE SET data = excluded.data",
+                        entries.items()
+                    )
+                    return cursor.rowcount
+                
+                # Entrée attendue absente : insérée seulement si elle n'existe toujours pas
+                inserted = conn.executemany(
+                    "INSERT INTO entries (account, data) VALUES (?, ?) ON CONFLICT(account) DO NOTHING",
+                    [(account, data) for account, data in entries.items() if expected.get(account) is None]
+                ).rowcount
+                updated = conn.executemany(
+                    "UPDATE entries SET data = ? WHERE account = ? AND data = ?",
+                    [(data, account, expected[account]) for account, data in entries.items() if expected.get(account) is not None]
+                ).rowcount
+            return inserted + updated
+    
+    def delete(self, account):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute("DELETE FROM entries WHERE account = ?", (account,))
+            return cursor.rowcount > 0
+    
+    def import_json(self, json_path=JSON_DB_FILE):
+        """Import unique depuis le format JSON historique ; retourne le nombre d'entrées"""
+        data = JsonVaultStore(json_path).load()
+        if not data:
+            return 0
+        self.save(data)
+        print(f"✅ Imported {len(data.get('passwords', {}))} entries from {json_path}")
+        return len(data.get('passwords', {}))
+    
+    def flush(self):
+        """Reporte le WAL dans le fichier principal (upload complet)"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
+
+def open_store(kind=None):
+    """Ouvre le stockage configuré (PM_STORAGE=json|journal|mmap|sharded|sqlite, JSON par défaut)"""
+    kind = kind or os.environ.get('PM_STORAGE', 'json')
+    
+    if kind == 'sqlite':
+        store = SqliteVaultStore(os.environ.get('PM_SQLITE_FILE', SQLITE_DB_FILE))
+        # Premier passage en SQLite : reprise du coffre JSON existant
+        if not store.load_meta() and os.path.exists(JSON_DB_FILE):
+            store.import_json(JSON_DB_FILE)
+        return store
+    
+    commit_window = float(os.environ.get('PM_GROUP_COMMIT_MS', 5)) / 1000
+    # Format du snapshot (json|binary) et compression du conteneur binaire (none|zlib|lzma)
+    file_format = os.environ.get('PM_VAULT_FORMAT', 'json')
+    compression = os.environ.get('PM_VAULT_COMPRESSION', 'none')
+    
+    if kind == 'mmap':
+        # Toujours le conteneur binaire non compressé : PM_VAULT_FORMAT est ignoré
+        return MmapVaultStore(
+            JSON_DB_FILE,
+            commit_window=commit_window,
+            max_journal_bytes=int(os.environ.get('PM_JOURNAL_MAX_BYTES', 1024 * 1024)),
+            max_journal_records=int(os.environ.get('PM_JOURNAL_MAX_RECORDS', 1000))
+        )
+    
+    if kind == 'sharded':
+        return ShardedVaultStore(
+            JSON_DB_FILE,
+            shards=int(os.environ.get('PM_SHARDS', SHARD_COUNT)),
+            commit_window=commit_window,
+            file_format=file_format,
+            compression=compression
+        )
+    
+    if kind == 'journal':
+        return JournalVaultStore(
+            JSON_DB_FILE,
+            commit_window=commit_window,
+            file_format=file_format,
+            compression=compression,
+            max_journal_bytes=int(os.environ.get('PM_JOURNAL_MAX_BYTES', 1024 * 1024)),
+            max_journal_records=int(os.environ.get('PM_JOURNAL_MAX_RECORDS', 1000))
+        )
+    
+    if kind == 'json':
+        return JsonVaultStore(JSON_DB_FILE, commit_window=commit_window, file_format=file_format, compression=compression)
+    
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Sémantique commune des backends de stockage
+"""
+
+import multiprocessing
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JournalVaultStore, JsonVaultStore, MmapVaultStore, ShardedVaultStore, SqliteVaultStore
+
+BACKENDS = {
+    'json': lambda directory: JsonVaultStore(os.path.join(directory, 'passwords.db')),
+    'journal': lambda directory: JournalVaultStore(os.path.join(directory, 'passwords.db')),
+    'mmap': lambda directory: MmapVaultStore(os.path.join(directory, 'passwords.db')),
+    'sharded': lambda directory: ShardedVaultStore(os.path.join(directory, 'passwords.db'), shards=4),
+    'sqlite': lambda directory: SqliteVaultStore(os.path.join(directory, 'passwords.sqlite'))
+}
+
+@pytest.fixture(params=sorted(BACKENDS))
+def store(request, tmp_path):
+    store = BACKENDS[request.param](str(tmp_path))
+    store.save({'header': {'version': 1}, 'passwords': {'existing': 'v2:old'}})
+    yield store
+    store.close()
+
+def test_put_many_inserts_entry_expected_absent(store):
+    assert store.put_many({'new': 'v2:new'}, expected={}) == 1
+    assert store.get('new') == 'v2:new'
+
+def test_put_many_skips_entry_created_meanwhile(store):
+    store.put('new', 'v2:other')
+    assert store.put_many({'new': 'v2:new'}, expected={'new': None}) == 0
+    assert store.get('new') == 'v2:other'
+
+def test_put_many_updates_only_unchanged_entries(store):
+    assert store.put_many({'existing': 'v2:stale'}, expected={'existing': 'v2:changed'}) == 0
+    assert store.get('existing') == 'v2:old'
+    assert store.put_many({'existing': 'v2:new', 'added': 'v2:added'}, expected={'existing': 'v2:old'}) == 2
+    assert store.get_many(['existing', 'added']) == {'existing': 'v2:new', 'added': 'v2:added'}
+
+@pytest.mark.parametrize('name', ['journal', 'mmap'])
+def test_compaction_keeps_records_appended_by_another_process(name, tmp_path):
+    first, second = BACKENDS[name](str(tmp_path)), BACKENDS[name](str(tmp_path))
+    first.save({'header': {'version': 1}, 'passwords': {'existing': 'v2:old'}})
+    first.put('mine', 'v2:mine')
+    encode = first._encode
+    def racing_encode(data):
+        # Append d'un autre processus entre la lecture et le remplacement
+        second.put('foreign', 'v2:foreign')
+        return encode(data)
+    first._encode = racing_encode
+    first.compact()
+    first._encode = encode
+    first.put('after', 'v2:after')
+    
+    reopened = BACKENDS[name](str(tmp_path))
+    assert sorted(reopened.accounts()) == ['after', 'existing', 'foreign', 'mine']
+    assert first._journal_bytes == os.path.getsize(first.journal_path)
+    for store in (first, second, reopened):
+        store.close()
+
+def _put_entries(name, directory, prefix, count, start):
+    store = BACKENDS[name](directory)
+    store.max_journal_records = 40
+    start.wait()
+    for index in range(count):
+        store.put(f'{prefix}{index}', f'v2:{prefix}{index}')
+    store.close()
+
+@pytest.mark.parametrize('name', ['journal', 'mmap'])
+def test_two_processes_appending_and_compacting_lose_nothing(name, tmp_path):
+    # GUI et web app sur le même coffre : appends et compactions concurrents
+    BACKENDS[name](str(tmp_path)).save({'header': {'version': 1}, 'passwords': {}})
+    start = multiprocessing.Event()
+    writers = [multiprocessing.Process(target=_put_entries, args=(name, str(tmp_path), prefix, 300, start)) for prefix in ('gui-', 'web-')]
+    for writer in writers:
+        writer.start()
+    start.set()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+    
+    store = BACKENDS[name](str(tmp_path))
+    assert len(store.accounts()) == 600
+    store.close()
+
+@pytest.mark.parametrize('name', ['journal', 'mmap'])
+def test_compaction_does_not_overwrite_reset_during_encode(name, tmp_path):
+    store = BACKENDS[name](str(tmp_path))
+    store.save({'header': {'version': 1}, 'passwords': {'existing': 'v2:old'}})
+    store.put('mine', 'v2:mine')
+    encode = store._encode
+    def racing_encode(data):
+        payload = encode(data)
+        store._encode = encode
+        store.save({'header': {'version': 2}, 'passwords': {'imported': 'v2:imported'}})
+        return payload
+    store._encode = racing_encode
+    store.compact()
+    
+    assert store.accounts() == ['imported']
+    assert store._journal_bytes == 0
+    store.close()
+
+def test_mmap_documents_stay_readable_after_close(tmp_path):
+    store = BACKENDS['mmap'](str(tmp_path))
+    store.save({'header': {'version': 1}, 'passwords': {'existing': 'v2:old'}})
+    # Ce que voit un lecteur en cours (entries(), get_many()...) quand un autre thread ferme le store
+    passwords = store._read()['passwords']
+    store.close()
+    assert passwords['existing'] == 'v2:old'
+
+def test_sharded_sync_paths_does_not_split_single_file_vault(tmp_path):
+    path = os.path.join(str(tmp_path), 'passwords.db')
+    JsonVaultStore(path).save({'header': {'version': 1}, 'passwords': {'existing': 'v2:old'}})
+    store = ShardedVaultStore(path, shards=4)
+    
+    assert store.sync_paths() == [path, path + '.journal']
+    assert store.referenced_paths() == []
+    assert not os.path.exists(store.shard_path(0))
+    
+    store.migrate()
+    assert store.referenced_paths() == [store.shard_path(index) for index in range(4)]
+    assert store.sync_paths()[1:] == store.referenced_paths()
+    assert store.entries() == {'existing': 'v2:old'}
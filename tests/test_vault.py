@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Format du coffre : migration d'un coffre historique vers une clé de données aléatoire
+"""
+
+import json
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crypto import PasswordCrypto
+from vault import change_master_password, ensure_header, has_legacy_key, rekey_vault, unlock
+
+@pytest.fixture
+def legacy_vault():
+    # Coffre v1 : auth_token et entrées sous la clé PBKDF2 à salt fixe du master password
+    legacy = PasswordCrypto('master')
+    return {
+        'auth_token': legacy.encrypt('auth'),
+        'passwords': {'mail': legacy.encrypt(json.dumps({'username': 'alice', 'password': 'secret'}), 'mail')}
+    }, legacy
+
+def test_ensure_header_marks_the_adopted_legacy_key(legacy_vault):
+    data, legacy = legacy_vault
+    assert ensure_header(data, unlock(data, 'master'), 'master')
+    assert has_legacy_key(data)
+    assert unlock(data, 'master').key_bytes == legacy.key_bytes
+    
+    # Un nouveau master password ne change pas la clé de données : la marque reste
+    change_master_password(data, 'master', 'other')
+    assert has_legacy_key(data)
+
+def test_rekey_vault_reencrypts_entries_under_a_random_key(legacy_vault):
+    data, legacy = legacy_vault
+    ensure_header(data, unlock(data, 'master'), 'master')
+    crypto = rekey_vault(data, legacy, 'master')
+    
+    assert not has_legacy_key(data)
+    assert 'auth_token' not in data
+    assert crypto.key_bytes != legacy.key_bytes
+    assert unlock(data, 'master').key_bytes == crypto.key_bytes
+    assert json.loads(crypto.decrypt(data['passwords']['mail'], 'mail'))['username'] == 'alice'
+    with pytest.raises(Exception):
+        legacy.decrypt(data['passwords']['mail'], 'mail')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Vue déchiffrée du coffre et index de recherche : entrées illisibles
+"""
+
+import json
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crypto import PasswordCrypto
+from search_index import SearchIndex, search_key
+from storage import JsonVaultStore
+from vault_model import EntryDecryptError, VaultView
+
+@pytest.fixture
+def view(tmp_path):
+    crypto = PasswordCrypto.from_key(os.urandom(32))
+    valid = crypto.encrypt(json.dumps({'username': 'alice', 'password': 'secret'}), 'valid')
+    # Dernier caractère modifié : le tag d'authentification ne correspond plus
+    tampered = crypto.encrypt(json.dumps({'username': 'bob', 'password': 'secret'}), 'tampered')
+    tampered = tampered[:-2] + ('AA' if tampered[-2:] != 'AA' else 'BB')
+    store = JsonVaultStore(os.path.join(str(tmp_path), 'passwords.db'))
+    store.save({'header': {'version': 3}, 'passwords': {
+        'valid': valid,
+        'tampered': tampered,
+        'not-json': crypto.encrypt('not json', 'not-json'),
+        'not-object': crypto.encrypt('[1, 2]', 'not-object')
+    }})
+    yield VaultView(store, crypto)
+    store.close()
+
+def test_get_raises_entry_decrypt_error(view):
+    assert view.get('valid')['username'] == 'alice'
+    assert view.get('missing') is None
+    for account in ('tampered', 'not-json', 'not-object'):
+        with pytest.raises(EntryDecryptError) as error:
+            view.get(account)
+        assert error.value.account == account
+
+def test_get_many_reports_unreadable_entries_individually(view):
+    results, errors = view.get_many(['valid', 'tampered', 'not-json', 'not-object', 'missing'])
+    assert list(results) == ['valid']
+    assert sorted(errors) == ['not-json', 'not-object', 'tampered']
+    assert errors['not-json'] == "invalid JSON"
+    assert errors['not-object'] == "not a JSON object"
+    
+    # Rien d'illisible n'est gardé dans le cache d'entrées en clair
+    assert view.stats()['entries'] == 1
+
+def test_search_index_build_skips_unreadable_entries(view, tmp_path):
+    index = SearchIndex(os.path.join(str(tmp_path), 'passwords.db.search'), save_delay=60)
+    assert index.build(view.store, view.crypto) == 1
+    key = search_key(view.crypto)
+    assert sorted(index.missing(key, view.store.entries())) == ['not-json', 'not-object', 'tampered']
+    assert index.search(view, 'alice') == ['valid']
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Format du coffre : en-tête versionné, vérification rapide du master password
+et chiffrement par enveloppe (clé de données enveloppée par le master password)
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from crypto import PasswordCrypto, derive_subkey
+from kdf import from_params, new_kdf
+
+VAULT_VERSION = 3  # 1 = {auth_token, passwords} sans en-tête, 2 = en-tête sans enveloppe
+KEY_CHECK_MESSAGE = b'password-manager key check'
+KEY_WRAP_AAD = b'password-manager data key'
+DATA_KEY_LENGTH = 32
+NONCE_LENGTH = 12
+
+class InvalidMasterPassword(Exception):
+    """Master password incorrect"""
+
+def key_check_value(crypto):
+    """Valeur de contrôle constante dérivée de la clé (ne révèle pas la clé)"""
+    subkey = derive_subkey(crypto.key_bytes, b'key-check')
+    digest = hmac.new(subkey, KEY_CHECK_MESSAGE, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii')
+
+def wrap_key(master_crypto, data_key):
+    """Enveloppe la clé de données (AES-GCM sous une sous-clé du master password)"""
+    nonce = os.urandom(NONCE_LENGTH)
+    wrapping = AESGCM(derive_subkey(master_crypto.key_bytes, b'key-wrap'))
+    sealed = wrapping.encrypt(nonce, data_key, KEY_WRAP_AAD)
+    return base64.urlsafe_b64encode(nonce + sealed).decode('ascii')
+
+def unwrap_key(master_crypto, wrapped_key):
+    """Retrouve la clé de données enveloppée"""
+    blob = base64.urlsafe_b64decode(wrapped_key.encode('ascii'))
+    wrapping = AESGCM(derive_subkey(master_crypto.key_bytes, b'key-wrap'))
+    return wrapping.decrypt(blob[:NONCE_LENGTH], blob[NONCE_LENGTH:], KEY_WRAP_AAD)
+
+def build_header(master_crypto, data_key):
+    """En-tête : version, KDF + salt, valeur de contrôle et clé de données enveloppée"""
+    return {
+        'version': VAULT_VERSION,
+        'kdf': master_crypto.kdf.to_params(),
+        'kcv': key_check_value(master_crypto),
+        'wrapped_key': wrap_key(master_crypto, data_key)
+    }
+
+def is_initialized(data):
+    """Indique si le document contient un coffre exploitable"""
+    return bool(data) and bool(data.get('header') or data.get('auth_token'))
+
+def kdf_params(data):
+    """Paramètres KDF du coffre (en-tête, ou clé 'kdf' des coffres sans en-tête)"""
+    header = data.get('header') or {}
+    return header.get('kdf') or data.get('kdf')
+
+def _check_master(data, master_password):
+    """Dérive la clé du master password et la vérifie ; retourne son PasswordCrypto"""
+    master_crypto = PasswordCrypto(master_password, from_params(kdf_params(data)))
+    header = data.get('header')
+    
+    if header and header.get('kcv'):
+        # Comparaison en temps constant, sans aucun déchiffrement
+        if not hmac.compare_digest(key_check_value(master_crypto), header['kcv']):
+            raise InvalidMasterPassword()
+        return master_crypto
+    
+    # Coffre sans en-tête : vérification historique par l'auth_token
+    try:
+        master_crypto.decrypt(data['auth_token'])
+    except Exception:
+        raise InvalidMasterPassword()
+    return master_crypto
+
+def unlock(data, master_password):
+    """Vérifie le master password ; retourne le PasswordCrypto des entrées"""
+    master_crypto = _check_master(data, master_password)
+    header = data.get('header') or {}
+    
+    if header.get('wrapped_key'):
+        return PasswordCrypto.from_key(unwrap_key(master_crypto, header['wrapped_key']))
+    
+    # Pas encore d'enveloppe : les entrées sont sous la clé du master password
+    return master_crypto
+
+def ensure_header(data, crypto, master_password):
+    """Passe le coffre au format enveloppe ; retourne True si modifié
+    
+    La clé actuelle des entrées devient la clé de données : rien n'est
+    rechiffré, seule l'enveloppe (nouveau salt) est écrite. Cette clé reste
+    celle d'origine (PBKDF2 à salt fixe pour un coffre v1), dérivable de
+    l'ancien master password même après un changement : l'en-tête la marque
+    (legacy_key) jusqu'à rekey_vault (migration opt-in, PM_MIGRATE_ENTRIES=1).
+    """
+    header = data.get('header') or {}
+    if header.get('version', 0) >= VAULT_VERSION and header.get('wrapped_key'):
+        return False
+    
+    master_crypto = PasswordCrypto(master_password, new_kdf())
+    data['header'] = {**build_header(master_crypto, crypto.key_bytes), 'legacy_key': True}
+    data.pop('kdf', None)
+    return True
+
+def has_legacy_key(data):
+    """Indique si la clé de données est encore la clé historique du master password"""
+    return bool((data.get('header') or {}).get('legacy_key'))
+
+def rekey_vault(data, crypto, master_password):
+    """Rechiffre toutes les entrées sous une nouvelle clé de données aléatoire ; retourne son PasswordCrypto
+    
+    data est le document complet. L'auth_token, chiffré sous l'ancienne clé, est
+    retiré. Une entrée indéchiffrable est gardée telle quelle (elle l'était déjà).
+    """
+    data_key = os.urandom(DATA_KEY_LENGTH)
+    new_crypto = PasswordCrypto.from_key(data_key)
+    passwords = dict(data.get('passwords', {}))
+    plaintexts, errors = crypto.decrypt_many(passwords, bind_keys=True)
+    ciphertexts, failed = new_crypto.encrypt_many(plaintexts, bind_keys=True)
+    for account, error in {**errors, **failed}.items():
+        print(f"⚠️  Rekey skipped for {account}: {error}")
+    passwords.update(ciphertexts)
+    
+    master_crypto = PasswordCrypto(master_password, new_kdf())
+    data['header'] = build_header(master_crypto, data_key)
+    data['passwords'] = passwords
+    data.pop('auth_token', None)
+    data.pop('kdf', None)
+    return new_crypto
+
+def change_master_password(data, current_password, new_password):
+    """Change le master password en ré-enveloppant la seule clé de données
+    
+    Coût constant quelle que soit la taille du coffre ; retourne le
+    PasswordCrypto des entrées (inchangé, les sessions restent valides).
+    """
+    crypto = unlock(data, current_password)
+    legacy_key = has_legacy_key(data)
+    master_crypto = PasswordCrypto(new_password, new_kdf())
+    data['header'] = build_header(master_crypto, crypto.key_bytes)
+    if legacy_key:
+        data['header']['legacy_key'] = True
+    data.pop('kdf', None)
+    return crypto
+
+def create_vault(master_password):
+    """Crée un coffre vide avec une clé de données aléatoire ; retourne (document, PasswordCrypto)"""
+    data_key = os.urandom(DATA_KEY_LENGTH)
+    master_crypto = PasswordCrypto(master_password, new_kdf())
+    data = {
+        'header': build_header(master_crypto, data_key),
+        'passwords': {}
+    }
+    return data, PasswordCrypto.from_key(data_key)
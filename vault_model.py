@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Vue déchiffrée à la demande d'un coffre, avec un cache LRU borné des entrées en clair,
+index trié des comptes pour la pagination et révision du coffre
+"""
+
+import base64
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from search_index import FINGERPRINT_LENGTH, normalize
+
+class EntryDecryptError(Exception):
+    """Entrée indéchiffrable (authentification) ou qui n'est pas un objet JSON"""
+    def __init__(self, account, message):
+        super().__init__(f"{account}: {message}")
+        self.account = account
+        self.message = message
+
+def decode_entries(plaintexts, errors):
+    """Objets JSON des textes déchiffrés ; les autres vont dans errors, comme un échec de déchiffrement"""
+    decoded = {}
+    for account, plaintext in plaintexts.items():
+        try:
+            data = json.loads(plaintext)
+        except ValueError:
+            errors[account] = "invalid JSON"
+            continue
+        if isinstance(data, dict):
+            decoded[account] = data
+        else:
+            errors[account] = "not a JSON object"
+    return decoded
+
+class VaultView:
+    def __init__(self, store, crypto, max_entries=256):
+        """Rien n'est déchiffré à l'ouverture : la liste des comptes vient du stockage
+        
+        Une entrée est déchiffrée à la première lecture puis gardée (au plus
+        max_entries) tant que son chiffré n'a pas changé dans le stockage.
+        """
+        self.store = store
+        self.crypto = crypto
+        self.max_entries = max_entries
+        self._plaintexts = OrderedDict()  # compte -> (entrée chiffrée, données en clair)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def accounts(self):
+        """Noms des comptes, sans aucun déchiffrement"""
+        return self.store.accounts()
+    
+    def get(self, account):
+        """Données en clair d'un compte ; None s'il n'existe pas, EntryDecryptError s'il est illisible"""
+        results, errors = self.get_many([account])
+        if account in errors:
+            raise EntryDecryptError(account, errors[account])
+        return results.get(account)
+    
+    def get_many(self, accounts):
+        """Déchiffre les comptes demandés ; retourne (résultats, {compte: message d'erreur}) dans l'ordre demandé"""
+        ciphertexts = self.store.get_many(accounts)
+        results = {}
+        missing = {}
+        
+        with self._lock:
+            for account in accounts:
+                ciphertext = ciphertexts.get(account)
+                if ciphertext is None:
+                    self._plaintexts.pop(account, None)
+                    continue
+                
+                cached = self._plaintexts.get(account)
+                if cached and cached[0] == ciphertext:
+                    self._plaintexts.move_to_end(account)
+                    self.hits += 1
+                    results[account] = dict(cached[1])
+                else:
+                    self.misses += 1
+                    missing[account] = ciphertext
+        
+        if missing:
+            plaintexts, errors = self.crypto.decrypt_many(missing, bind_keys=True)
+            decrypted = decode_entries(plaintexts, errors)
+            # Copies rendues avant de remplir le cache : un lot plus grand que le
+            # cache en évince (et efface) une partie aussitôt
+            results.update((account, dict(data)) for account, data in decrypted.items())
+            self._remember(missing, decrypted)
+        else:
+            errors = {}
+        
+        ordered = {account: results[account] for account in accounts if account in results}
+        return ordered, errors
+    
+    def _remember(self, ciphertexts, decrypted):
+        with self._lock:
+            for account, data in decrypted.items():
+                self._plaintexts[account] = (ciphertexts[account], data)
+                self._plaintexts.move_to_end(account)
+            
+            # LRU : les entrées en clair les moins récemment lues sont oubliées
+            while len(self._plaintexts) > self.max_entries:
+                _, (_, data) = self._plaintexts.popitem(last=False)
+                data.clear()
+                self.evictions += 1
+    
+    def forget(self, account):
+        """Oublie l'entrée en clair d'un compte (modifiée ou supprimée)"""
+        with self._lock:
+            cached = self._plaintexts.pop(account, None)
+        if cached:
+            cached[1].clear()
+    
+    def wipe(self):
+        """Oublie toutes les entrées en clair (logout, éviction de la session)"""
+        with self._lock:
+            for _, data in self._plaintexts.values():
+                data.clear()
+            self._plaintexts.clear()
+    
+    def stats(self):
+        """Compteurs du cache d'entrées en clair"""
+        with self._lock:
+            return {
+                'entries': len(self._plaintexts),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+def fingerprint(ciphertext):
+    """Fin d'un chiffré (tag d'authentification), qui change à chaque écriture ; None si absent"""
+    return ciphertext[-FINGERPRINT_LENGTH:] if ciphertext else None
+
+def encode_cursor(key):
+    """Curseur opaque : la clé de tri du dernier compte d'une page"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Clé de tri d'un curseur ; ValueError s'il est invalide"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(part, str) for part in key)):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+class AccountIndex:
+    def __init__(self):
+        """Comptes triés par nom (sans casse ni accents), pour paginer par curseur
+        
+        L'index n'est retrié que si la liste des comptes du stockage a changé.
+        Une page commence juste après la clé du curseur : l'ordre reste stable
+        même si des comptes sont ajoutés ou supprimés entre deux pages.
+        """
+        self._lock = threading.Lock()
+        self._source = None
+        self._keys = []  # (nom normalisé, nom) triés
+        self.rebuilds = 0
+    
+    def sorted_keys(self, accounts):
+        """Clés de tri des comptes, reconstruites seulement si la liste a changé"""
+        with self._lock:
+            if accounts != self._source:
+                self._keys = sorted((normalize(account), account) for account in accounts)
+                self._source = accounts
+                self.rebuilds += 1
+            return self._keys
+    
+    def page(self, accounts, limit, cursor=None, matching=None):
+        """(comptes de la page, curseur suivant ou None)
+        
+        matching : ensemble des comptes retenus par un filtre (None = tous).
+        """
+        keys = self.sorted_keys(accounts)
+        position = bisect.bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+        found = []
+        # Un compte de plus que la page : il dit s'il reste une page suivante
+        while position < len(keys) and len(found) <= limit:
+            if matching is None or keys[position][1] in matching:
+                found.append(keys[position])
+            position += 1
+        
+        next_cursor = encode_cursor(found[limit - 1]) if len(found) > limit else None
+        return [account for _, account in found[:limit]], next_cursor
+    
+    def stats(self):
+        with self._lock:
+            return {'accounts': len(self._keys), 'rebuilds': self.rebuilds}
+
+class VaultRevision:
+    def __init__(self, store):
+        """Révision du coffre : croît à chaque écriture de ce processus, ou quand ses fichiers changent sur disque
+        
+        Elle part de l'heure courante (en ms) : les révisions données par un
+        processus précédent restent plus petites que celles de celui-ci.
+        Dès la première demande de changements, la révision de chaque entrée
+        est suivie (empreinte du chiffré), suppressions comprises.
+        """
+        self.store = store
+        self._lock = threading.Lock()
+        self.revision = time.time_ns() // 1000000
+        self._signature = self._files_signature()
+        self._changes = None  # compte -> (empreinte, ou None si supprimé ; révision), du plus ancien au plus récent
+        self._since = None  # Révision de début du suivi
+        self._dirty = False  # Fichiers changés hors de ce processus : entrées à comparer
+    
+    def _files_signature(self):
+        # Fichiers du coffre, et le WAL de SQLite où vont les écritures récentes
+        paths = self.store.sync_paths()
+        signature = []
+        for path in paths + [paths[0] + '-wal']:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def current(self):
+        """Révision actuelle, revalidée par un stat() des fichiers du coffre"""
+        signature = self._files_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._signature = signature
+                self.revision += 1
+                self._dirty = True
+            return self.revision
+    
+    def bump(self, accounts=None):
+        """Nouvelle révision, après une écriture de ce processus
+        
+        accounts : comptes écrits ou supprimés (None si inconnus : toutes les
+        entrées seront comparées à la prochaine demande de changements).
+        """
+        written = self.store.get_many(accounts) if accounts is not None and self._changes is not None else None
+        signature = self._files_signature()
+        with self._lock:
+            self._signature = signature
+            self.revision += 1
+            if self._changes is not None:
+                if written is None:
+                    self._dirty = True
+                else:
+                    self._record({account: fingerprint(written.get(account)) for account in accounts})
+            return self.revision
+    
+    def _record(self, fingerprints):
+        for account, value in fingerprints.items():
+            if self._changes.get(account, (None,))[0] != value:
+                self._changes[account] = (value, self.revision)
+                self._changes.move_to_end(account)
+    
+    def _compare(self):
+        # Entrées changées hors de ce processus : comparaison de toutes les empreintes
+        fingerprints = {account: fingerprint(ciphertext) for account, ciphertext in self.store.entries().items()}
+        removed = [account for account, (value, _) in self._changes.items() if value is not None and account not in fingerprints]
+        fingerprints.update((account, None) for account in removed)
+        self._record(fingerprints)
+        self._dirty = False
+    
+    def changes(self, since=None):
+        """(révision, {compte: empreinte, ou None si supprimé} changés après since, reset)
+        
+        reset : since est absent ou antérieur au suivi (autre processus) ; toutes
+        les entrées sont renvoyées et le client repart de zéro.
+        """
+        self.current()
+        with self._lock:
+            if self._changes is None:
+                self._changes = OrderedDict()
+                self._since = self.revision
+                self._compare()
+            elif self._dirty:
+                self._compare()
+            
+            if since is None or since < self._since or since > self.revision:
+                return self.revision, {account: value for account, (value, _) in self._changes.items() if value is not None}, True
+            
+            # Les plus récents en dernier : on remonte jusqu'à since
+            changed = {}
+            for account in reversed(self._changes):
+                value, revision = self._changes[account]
+                if revision <= since:
+                    break
+                changed[account] = value
+            return self.revision, changed, False
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'revision': self.revision,
+                'tracked': len(self._changes) if self._changes is not None else None,
+                'since': self._since
+            }
@@ -3,23 +3,68 @@
 Application Flask PWA CORRIGÉE - Version finale compatible Flask 2.3.3
 """
 
-from flask import Flask, render_template_string, request, jsonify, session, Response
+from flask import Flask, request, jsonify, session, Response, send_from_directory
+from werkzeug.security import safe_join
 import json
+import mimetypes
 import os
 import sys
-from crypto import PasswordCrypto
+from compression import COMPRESS_MIN_SIZE, COMPRESSIBLE_TYPES, STATIC_SUFFIXES, SUFFIXES, compress, negotiate, precompress_directory, precompressed
+from crypto import migrate_entries, upgrade_entry
 from dropbox_sync import DropboxSync
+from key_cache import KeyCache
+from kdf import KDFPool, KDFPoolSaturated
+from scrub import Scrubber
+from search_index import SearchIndex, search_key
+from storage import open_store
+from vault_model import AccountIndex, EntryDecryptError, VaultRevision, VaultView
+from vault import InvalidMasterPassword, change_master_password, create_vault, ensure_header, has_legacy_key, is_initialized, rekey_vault, unlock
 import secrets
 import string
 import datetime
+import threading
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
 
+PAGE_SIZE = 50  # Comptes par page de /api/passwords (?limit=)
+MAX_PAGE_SIZE = 500
+
 class PWAPasswordManager:
     def __init__(self):
         self.dropbox = DropboxSync()
-        self.db_file = "passwords.db"
+        # Stockage du coffre (PM_STORAGE=json|sqlite)
+        self.store = open_store()
+        self.db_file = self.store.path
+        # Clés dérivées gardées côté serveur : le KDF ne tourne qu'au login
+        # Chaque session y garde sa vue du coffre (clé + entrées en clair récentes)
+        self.key_cache = KeyCache(
+            max_entries=int(os.environ.get('PM_KEY_CACHE_SIZE', 256)),
+            idle_ttl=int(os.environ.get('PM_KEY_CACHE_TTL', 900)),
+            on_evict=lambda view: view.wipe()
+        )
+        self.plaintext_cache_size = int(os.environ.get('PM_PLAINTEXT_CACHE', 256))
+        # Index de recherche aveugle (jetons HMAC), à côté du coffre
+        self.search_index = SearchIndex(self.db_file + '.search')
+        self._indexing = False
+        # Comptes triés pour la pagination par curseur de /api/passwords
+        self.account_index = AccountIndex()
+        # Révision du coffre, ETag des lectures de l'API
+        self.revision = VaultRevision(self.store)
+        # Vérification du coffre (scrub), une passe à la fois
+        self.scrubber = None
+        self._scrubbing = False
+        # Dérivations de clé hors des threads de requête, en nombre borné
+        self.kdf_pool = KDFPool(
+            max_workers=int(os.environ.get('PM_KDF_WORKERS', 0)) or None,
+            max_queue=int(os.environ.get('PM_KDF_QUEUE', 16)),
+            timeout=int(os.environ.get('PM_KDF_TIMEOUT', 30))
+        )
+        # Sérialise les lecture-modification-écriture des méta-données
+        self.write_lock = threading.RLock()
+        # Migration des entrées v1 -> v2 (opt-in)
+        self.migrate_entries = os.environ.get('PM_MIGRATE_ENTRIES') == '1'
+        self._migration_started = False
      # ✅ AJOUTEZ CETTE NOUVELLE MÉTHODE
     def create_dropbox_backup(self):
         """Crée un backup horodaté sur Dropbox"""
@@ -31,8 +76,14 @@ class PWAPasswordManager:
             now = datetime.datetime.now()
             backup_name = f"passwords-{now.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
             
-            # Upload du backup sur Dropbox
-            success = self.dropbox.upload(self.db_file, f"/{backup_name}")
+            # Copies côté Dropbox des fichiers qui viennent d'être envoyés :
+            # fichiers annexes (journal, shards) sous le même horodatage, avant le fichier principal
+            for path in self.store.sync_paths()[1:]:
+                if os.path.exists(path):
+                    self.dropbox.copy(f"/{path}", f"/{backup_name}{path[len(self.db_file):]}")
+            
+            # Backup du fichier principal
+            success = self.dropbox.copy(f"/{self.db_file}", f"/{backup_name}")
             if success:
                 print(f"📦 Backup créé sur Dropbox: {backup_name}")
                 return True
@@ -49,91 +100,269 @@ class PWAPasswordManager:
     def authenticate(self, master_password):
         """Authentification robuste"""
         try:
-            crypto = PasswordCrypto(master_password)
-            
             # Sync Dropbox avec gestion d'erreurs
             try:
+                # Le fichier local va être remplacé : on relâche le stockage
+                self.store.close()
                 download_success = self.dropbox.download(self.db_file)
                 if download_success:
                     print("✅ Database downloaded from Dropbox")
+                    self.dropbox.download_companion_files(self.store)
             except Exception as e:
                 print(f"⚠️  Dropbox sync warning: {e}")
             
-            auth_token = None
+            data = None
+            try:
+                # Seules les méta-données servent au déverrouillage
+                data = self.store.load_meta()
+            except Exception as e:
+                print(f"Database error: {e}")
             
-            if os.path.exists(self.db_file):
+            if is_initialized(data):
                 try:
-                    with open(self.db_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        auth_token = data.get('auth_token')
-                        
-                        if auth_token:
-                            crypto.decrypt(auth_token)
-                            session['authenticated'] = True
-                            session['master_password'] = master_password
-                            return {"success": True, "passwords": data.get('passwords', {})}
-                            
-                except Exception as e:
-                    if "decrypt" in str(e).lower():
-                        return {"success": False, "error": "Incorrect master password"}
-                    print(f"Database error: {e}")
+                    # Vérification par l'en-tête (KDF + salt du coffre)
+                    crypto = self.kdf_pool.run(unlock, data, master_password)
+                except InvalidMasterPassword:
+                    return {"success": False, "error": "Incorrect master password"}
+                
+                # Coffre sans enveloppe : en-tête ajouté une seule fois
+                if self.kdf_pool.run(ensure_header, data, crypto, master_password):
+                    self.save_meta(data)
+                if self.migrate_entries and has_legacy_key(data):
+                    crypto = self.rekey(crypto, master_password)
+                
+                self.open_session(crypto)
+                if self.migrate_entries:
+                    self.start_entry_migration()
+                return {"success": True}
             
             # Premier lancement
             print("Creating new database...")
-            token = crypto.encrypt("AUTH_VALID")
-            self.save_database(token, {})
-            session['authenticated'] = True
-            session['master_password'] = master_password
-            return {"success": True, "passwords": {}, "first_time": True}
+            data, crypto = self.kdf_pool.run(create_vault, master_password)
+            self.save_database(data)
+            self.open_session(crypto)
+            return {"success": True, "first_time": True}
             
+        except KDFPoolSaturated:
+            raise
         except Exception as e:
             print(f"Auth error: {e}")
             return {"success": False, "error": str(e)}
     
-    def get_crypto(self):
+    def open_session(self, crypto):
+        """Ouvre la session : seul un handle opaque part dans le cookie"""
+        session.clear()
+        session['authenticated'] = True
+        view = VaultView(self.store, crypto, self.plaintext_cache_size)
+        session['key_handle'] = self.key_cache.put(view)
+        self.start_indexing(crypto)
+    
+    def close_session(self):
+        """Ferme la session et oublie la clé dérivée et les entrées en clair"""
+        self.key_cache.discard(session.get('key_handle'))
+        session.clear()
+    
+    def get_view(self):
+        """Vue du coffre de la session (déchiffrement à la demande), ou None"""
         if not session.get('authenticated'):
             return None
-        return PasswordCrypto(session['master_password'])
+        
+        view = self.key_cache.get(session.get('key_handle'))
+        if view is None:
+            # Clé expirée ou évincée : il faut se reconnecter
+            session.clear()
+        return view
+    
+    def get_crypto(self):
+        view = self.get_view()
+        return view.crypto if view else None
+    
+    def start_indexing(self, crypto):
+        """Complète l'index de recherche en arrière-plan (une passe à la fois)"""
+        with self.write_lock:
+            if self._indexing:
+                return
+            self._indexing = True
+        threading.Thread(target=self._index_worker, args=(crypto,), daemon=True).start()
+    
+    def _index_worker(self, crypto):
+        try:
+            self.search_index.build(self.store, crypto)
+        except Exception as e:
+            print(f"⚠️  Search index error: {e}")
+        finally:
+            with self.write_lock:
+                self._indexing = False
+    
+    def page_accounts(self, view, query='', limit=PAGE_SIZE, cursor=None):
+        """Une page de comptes triés (filtrés par la recherche si query) ; (comptes, curseur suivant, total)"""
+        accounts = view.accounts()
+        matching = set(self.search_index.search(view, query)) if query.strip() else None
+        page, next_cursor = self.account_index.page(accounts, limit, cursor, matching)
+        return page, next_cursor, len(accounts) if matching is None else len(matching)
+    
+    def start_scrub(self, crypto, incremental=False):
+        """Lance une vérification du coffre en arrière-plan ; False si une passe est en cours"""
+        with self.write_lock:
+            if self._scrubbing:
+                return False
+            self._scrubbing = True
+            # Threads : un pool de processus persistant hériterait des clés de session
+            self.scrubber = Scrubber(self.store, crypto, executor='thread')
+        threading.Thread(target=self._scrub_worker, args=(self.scrubber, incremental), daemon=True).start()
+        return True
+    
+    def _scrub_worker(self, scrubber, incremental):
+        try:
+            scrubber.run(incremental)
+        except Exception as e:
+            print(f"⚠️  Scrub error: {e}")
+        finally:
+            with self.write_lock:
+                self._scrubbing = False
+    
+    def scrub_progress(self):
+        """Progression de la passe en cours, ou rapport de la dernière"""
+        progress = self.scrubber.progress() if self.scrubber else {'running': False}
+        progress['running'] = self._scrubbing
+        return progress
+    
+    def start_entry_migration(self):
+        """Lance une seule fois la migration v2 en arrière-plan"""
+        with self.write_lock:
+            if self._migration_started:
+                return
+            self._migration_started = True
+        threading.Thread(target=self._migration_worker, daemon=True).start()
+    
+    def _migration_worker(self):
+        """Réécrit les entrées v1 au format v2 (sans déchiffrement)"""
+        try:
+            with self.write_lock:
+                entries = self.store.entries()
+                migrated, count = migrate_entries(entries)
+                changed = {account: entry for account, entry in migrated.items() if entries[account] != entry}
+                
+                meta = self.store.load_meta()
+                auth_token = meta.get('auth_token')
+                if auth_token:
+                    meta['auth_token'] = upgrade_entry(auth_token)
+                
+                # Seules les entrées réécrites, et pas modifiées entre-temps
+                if changed:
+                    count = self.store.put_many(changed, expected=entries)
+                if meta.get('auth_token') != auth_token:
+                    self.store.save_meta(meta)
+                if changed or meta.get('auth_token') != auth_token:
+                    self.revision.bump(list(changed))
+                    self.sync_to_dropbox()
+                    print(f"✅ Migrated {count} entries to format v2")
+        except Exception as e:
+            print(f"⚠️  Entry migration error: {e}")
+    
+    def rekey(self, crypto, master_password):
+        """Rechiffre le coffre sous une clé de données aléatoire ; retourne son PasswordCrypto"""
+        with self.write_lock:
+            document = self.store.load()
+            crypto = self.kdf_pool.run(rekey_vault, document, crypto, master_password)
+            self.store.save(document)
+            # Les sessions ouvertes ont l'ancienne clé : reconnexion nécessaire
+            self.key_cache.clear()
+        self.revision.bump()
+        print("✅ Vault re-encrypted under a new data key")
+        self.sync_to_dropbox()
+        return crypto
+    
+    def change_master_password(self, current_password, new_password):
+        """Ré-enveloppe la clé de données : O(1) quelle que soit la taille du coffre"""
+        with self.write_lock:
+            meta = self.store.load_meta()
+            try:
+                self.kdf_pool.run(change_master_password, meta, current_password, new_password)
+            except InvalidMasterPassword:
+                return {"success": False, "error": "Incorrect master password"}
+            self.save_meta(meta)
+        return {"success": True}
+    
+    def load_vault(self):
+        """Charge le document complet (en-tête + entrées) ; {} si absent"""
+        return self.store.load()
     
     def load_passwords(self):
         try:
-            if os.path.exists(self.db_file):
-                with open(self.db_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('passwords', {})
+            return self.store.entries()
         except Exception as e:
             print(f"Error loading passwords: {e}")
         return {}
     
     # ✅ MODIFIEZ CETTE MÉTHODE EXISTANTE
-    def save_database(self, auth_token, passwords):
+    def save_database(self, data):
+        """Écrit le document tel quel : l'en-tête et l'auth_token ne sont pas retouchés"""
         try:
-            data = {
-                'auth_token': auth_token,
-                'passwords': passwords
-            }
-            
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            with self.write_lock:
+                self.store.save(data)
+            self.revision.bump()
             
             print("✅ Database saved locally")
-            
-            try:
-                # Upload principal
-                success = self.dropbox.upload(self.db_file)
-                if success:
-                    print("✅ Uploaded to Dropbox")
-                    
-                    # ✅ NOUVEAU : Backup automatique
-                    self.create_dropbox_backup()
-                    
-            except Exception as e:
-                print(f"⚠️  Dropbox upload warning: {e}")
+            self.sync_to_dropbox()
         
         except Exception as e:
             print(f"Save error: {e}")
             raise e
     
+    def save_meta(self, data):
+        """Écrit l'en-tête et les champs historiques, sans réécrire les entrées"""
+        with self.write_lock:
+            self.store.save_meta({k: v for k, v in data.items() if k != 'passwords'})
+        self.revision.bump(())
+        self.sync_to_dropbox()
+    
+    def save_entry(self, account, encrypted, data=None, expected=None):
+        """Écrit une seule entrée (une ligne en SQLite, regroupée en JSON) ; retourne True si écrite
+        
+        Avec expected (chiffré lu avant modification), l'entrée n'est écrite
+        que si elle n'a pas changé entre-temps.
+        """
+        if expected is None:
+            self.store.put(account, encrypted)
+        elif not self.store.put_many({account: encrypted}, expected={account: expected}):
+            return False
+        self.revision.bump([account])
+        crypto = self.get_crypto()
+        if data is not None and crypto:
+            # L'index est mis à jour avec l'entrée en clair déjà en main
+            self.search_index.update(search_key(crypto), {account: (encrypted, data)})
+        print("✅ Database saved locally")
+        self.sync_to_dropbox()
+        return True
+    
+    def delete_entry(self, account):
+        """Supprime une entrée ; retourne True si elle existait"""
+        if not self.store.delete(account):
+            return False
+        self.revision.bump([account])
+        self.search_index.remove([account])
+        print("✅ Database saved locally")
+        self.sync_to_dropbox()
+        return True
+    
+    def sync_to_dropbox(self):
+        """Envoie le fichier du coffre sur Dropbox, puis un backup horodaté"""
+        try:
+            self.store.flush()
+            
+            # Upload principal
+            self.dropbox.upload_companion_files(self.store)
+            success = self.dropbox.upload(self.db_file, if_changed=True)
+            if success:
+                print("✅ Uploaded to Dropbox")
+                
+                # ✅ NOUVEAU : Backup automatique
+                self.create_dropbox_backup()
+                
+        except Exception as e:
+            print(f"⚠️  Dropbox upload warning: {e}")
+    
     def generate_password(self, length=16):
         chars = string.ascii_letters + string.digits + "!@#$%^&*"
         return ''.join(secrets.choice(chars) for _ in range(length))
@@ -141,8 +370,15 @@ class PWAPasswordManager:
 # Instance globale
 manager = PWAPasswordManager()
 
+_static_initialized = False
+
 def init_static_files():
-    """Initialise les fichiers statiques nécessaires"""
+    """Initialise les fichiers statiques nécessaires (une fois par processus), puis leurs versions compressées"""
+    global _static_initialized
+    if _static_initialized:
+        return
+    _static_initialized = True
+    
     try:
         if not os.path.exists('static'):
             os.makedirs('static')
@@ -172,6 +408,10 @@ def init_static_files():
             with open(manifest_path, 'w') as f:
                 json.dump(manifest, f, indent=2)
             print("📄 Created manifest.json")
+        
+        written = precompress_directory(app.static_folder)
+        if written:
+            print(f"🗜️  Precompressed {written} static files")
             
     except Exception as e:
         print(f"Init static files error: {e}")
@@ -348,6 +588,7 @@ MAIN_HTML = '''<!DOCTYPE html>
         .card-username { color: #b0b0b0; font-size: 0.95rem; }
         .empty-state { text-align: center; padding: 4rem 1rem; color: #b0b0b0; }
         .empty-state .icon { font-size: 4rem; margin-bottom: 1rem; }
+        .load-more { align-self: center; margin: 0.5rem 0 1rem; }
         .fab {
             position: fixed; bottom: 2rem; right: 2rem; width: 60px; height: 60px;
             border-radius: 50%; background: linear-gradient(135deg, #4a9eff 0%, #3d8bdb 100%);
@@ -400,38 +641,79 @@ MAIN_HTML = '''<!DOCTYPE html>
     </div>
 
     <script>
-        let passwords = {};
+        let accounts = [];  // Comptes des pages chargées, dans l'ordre du serveur
+        let usernames = {};  // Identifiants affichés dans la liste (?fields=username)
+        let passwords = {};  // Entrées complètes, chargées une à une quand elles sont affichées
+        let nextCursor = null;
+        let revision = null;  // Révision du coffre affichée (/api/changes)
+        let loadSeq = 0;
+        let loadingPage = false;
+        let searchTimer = null;
+        const PAGE_LIMIT = 50;
+        const pageObserver = 'IntersectionObserver' in window
+            ? new IntersectionObserver(onSentinelVisible, { rootMargin: '400px' })
+            : null;
         
         async function loadPasswords() {
+            // Première page seulement (triée et filtrée côté serveur) : la suite au défilement
+            loadSeq++;
+            accounts = [];
+            usernames = {};
+            passwords = {};
+            nextCursor = null;
+            await loadPage();
+        }
+        
+        async function loadPage() {
+            const seq = loadSeq;
+            const first = accounts.length === 0;
+            const query = document.getElementById('searchInput').value.trim();
+            const params = new URLSearchParams({ limit: PAGE_LIMIT, fields: 'username' });
+            if (query) params.set('q', query);
+            if (nextCursor) params.set('cursor', nextCursor);
+            
+            loadingPage = true;
             try {
-                const response = await fetch('/api/passwords');
+                const response = await fetch('/api/passwords?' + params.toString());
                 const result = await response.json();
+                if (seq !== loadSeq) return;
                 
                 if (result.success) {
-                    passwords = result.passwords;
-                    renderPasswords();
-                } else {
+                    result.accounts.forEach(account => {
+                        usernames[account] = (result.passwords[account] || {}).username || '';
+                    });
+                    accounts = accounts.concat(result.accounts);
+                    nextCursor = result.next_cursor;
+                    if (first) revision = result.revision;
+                    renderAccounts(result.accounts, first, query);
+                } else if (first) {
                     document.getElementById('passwordList').innerHTML = '<div class="empty-state"><div class="icon">🔐</div><p>No passwords yet. Click + to add one!</p></div>';
                 }
             } catch (error) {
                 console.error('Load error:', error);
                 showToast('Connection error', 'error');
+            } finally {
+                if (seq === loadSeq) loadingPage = false;
             }
         }
         
-        function renderPasswords(filter = '') {
+        function renderAccounts(page, first, query) {
             const list = document.getElementById('passwordList');
-            const filtered = Object.entries(passwords).filter(([account]) => 
-                account.toLowerCase().includes(filter.toLowerCase())
-            );
+            const previous = document.getElementById('loadMore');
+            if (previous) {
+                if (pageObserver) pageObserver.unobserve(previous);
+                previous.remove();
+            }
             
-            if (filtered.length === 0) {
-                list.innerHTML = '<div class="empty-state"><div class="icon">🔍</div><p>No passwords found</p></div>';
+            if (first && page.length === 0) {
+                list.innerHTML = query
+                    ? '<div class="empty-state"><div class="icon">🔍</div><p>No passwords found</p></div>'
+                    : '<div class="empty-state"><div class="icon">🔐</div><p>No passwords yet. Click + to add one!</p></div>';
                 return;
             }
             
-            list.innerHTML = filtered.map(([account, data]) => `
-                <div class="password-card" onclick="viewPassword('${escapeHtml(account)}')">
+            const cards = page.map(account => `
+                <div class="password-card" data-account="${escapeHtml(account)}" onclick="viewPassword('${escapeHtml(account)}')">
                     <div class="card-header">
                         <div class="card-title">${escapeHtml(account)}</div>
                         <div class="card-actions" onclick="event.stopPropagation()">
@@ -439,17 +721,97 @@ MAIN_HTML = '''<!DOCTYPE html>
                             <button class="btn-icon" onclick="editPassword('${escapeHtml(account)}')" title="Edit">✏️</button>
                         </div>
                     </div>
-                    <div class="card-username">${escapeHtml(data.username)}</div>
+                    <div class="card-username">${escapeHtml(usernames[account]) || '&nbsp;'}</div>
                 </div>
             `).join('');
+            
+            if (first) {
+                list.innerHTML = cards;
+            } else {
+                list.insertAdjacentHTML('beforeend', cards);
+            }
+            
+            // Page suivante chargée quand la fin de la liste approche
+            if (nextCursor) {
+                list.insertAdjacentHTML('beforeend', '<button class="btn-sm btn-outline load-more" id="loadMore" onclick="loadMore()">Load more</button>');
+                if (pageObserver) pageObserver.observe(document.getElementById('loadMore'));
+            }
+        }
+        
+        function onSentinelVisible(entries) {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMore();
+            }
+        }
+        
+        function loadMore() {
+            if (nextCursor && !loadingPage) {
+                loadPage();
+            }
+        }
+        
+        async function syncChanges() {
+            // Onglet resté ouvert : seules les entrées changées depuis l'affichage sont renvoyées
+            if (revision === null || loadingPage) return;
+            try {
+                const response = await fetch('/api/changes?fields=username&since=' + revision);
+                const result = await response.json();
+                if (!result.success || result.revision === revision) return;
+                
+                // Comptes ajoutés ou supprimés : la liste (triée, paginée) est rechargée
+                const upserted = Object.keys(result.upserts);
+                if (result.reset || result.deleted.length || upserted.some(account => !(account in usernames))) {
+                    loadPasswords();
+                    return;
+                }
+                
+                revision = result.revision;
+                upserted.forEach(account => {
+                    usernames[account] = result.upserts[account].username || '';
+                    delete passwords[account];
+                });
+                document.querySelectorAll('.password-card').forEach(card => {
+                    if (card.dataset.account in result.upserts) {
+                        card.querySelector('.card-username').textContent = usernames[card.dataset.account];
+                    }
+                });
+            } catch (error) {
+                console.error('Sync error:', error);
+            }
+        }
+        
+        function entryUrl(account) {
+            return '/api/passwords/' + encodeURIComponent(account);
+        }
+        
+        async function ensureEntry(account) {
+            if (!passwords[account]) {
+                try {
+                    const response = await fetch(entryUrl(account));
+                    const result = await response.json();
+                    if (result.success) {
+                        passwords[account] = result.password;
+                    }
+                } catch (error) {
+                    console.error('Load error:', error);
+                }
+            }
+            if (!passwords[account]) {
+                showToast('Entry could not be loaded', 'error');
+            }
+            return passwords[account];
         }
         
         function filterPasswords() {
-            renderPasswords(document.getElementById('searchInput').value);
+            // Filtrage côté serveur (noms, identifiants, URLs) : une requête par pause de frappe
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(loadPasswords, 150);
         }
         
         async function copyPassword(account) {
-            const password = passwords[account].password;
+            const data = await ensureEntry(account);
+            if (!data) return;
+            const password = data.password;
             
             try {
                 if (navigator.clipboard) {
@@ -470,8 +832,9 @@ MAIN_HTML = '''<!DOCTYPE html>
             }
         }
         
-        function viewPassword(account) {
-            const data = passwords[account];
+        async function viewPassword(account) {
+            const data = await ensureEntry(account);
+            if (!data) return;
             document.getElementById('modalTitle').textContent = account;
             document.getElementById('modalContent').innerHTML = `
                 <div class="form-group">
@@ -553,8 +916,9 @@ MAIN_HTML = '''<!DOCTYPE html>
             setTimeout(() => document.getElementById('account').focus(), 100);
         }
         
-        function editPassword(account) {
-            const data = passwords[account];
+        async function editPassword(account) {
+            const data = await ensureEntry(account);
+            if (!data) return;
             document.getElementById('modalTitle').textContent = 'Edit ' + account;
             document.getElementById('modalContent').innerHTML = `
                 <form onsubmit="return savePassword(event, '${escapeHtml(account)}')">
@@ -597,14 +961,19 @@ MAIN_HTML = '''<!DOCTYPE html>
             }
             
             try {
-                const response = await fetch('/api/passwords', {
-                    method: 'POST',
+                const response = await fetch(entryUrl(account), {
+                    method: 'PUT',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ account, username, password, notes })
+                    body: JSON.stringify({ username, password, notes })
                 });
                 
                 const result = await response.json();
                 
+                if (result.success && originalAccount && originalAccount !== account) {
+                    // Compte renommé : l'ancienne entrée est supprimée
+                    await fetch(entryUrl(originalAccount), { method: 'DELETE' });
+                }
+                
                 if (result.success) {
                     showToast('Password saved! 🎉');
                     closeModal();
@@ -675,6 +1044,10 @@ MAIN_HTML = '''<!DOCTYPE html>
         // Initialiser au chargement
         loadPasswords();
         
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'visible') syncChanges();
+        });
+        
         // Gestion du clavier
         document.addEventListener('keydown', (e) => {
             if (e.key === 'Escape') {
@@ -685,6 +1058,121 @@ MAIN_HTML = '''<!DOCTYPE html>
 </body>
 </html>'''
 
+ENTRY_FIELDS = ('username', 'password', 'notes')
+
+def parse_fields(value):
+    """Champs demandés par ?fields= (le nom du compte est toujours la clé) ; None = tous"""
+    if value is None:
+        return None
+    return [field for field in (part.strip() for part in value.split(',')) if field and field != 'account']
+
+def project(data, fields):
+    """Ne garde que les champs demandés d'une entrée en clair"""
+    if fields is None:
+        return data
+    return {field: data[field] for field in fields if field in data}
+
+def entry_from_json(data):
+    """Champs d'une entrée envoyés par le client (chaînes, sans espaces autour)"""
+    return {field: str(data[field]).strip() for field in ENTRY_FIELDS if data.get(field) is not None}
+
+SECRET_FIELDS = ('password', 'notes')  # Jamais gardés dans le cache HTTP du navigateur
+
+def vault_etag(revision=None):
+    """ETag des lectures de l'API : la révision du coffre, lue avant les données"""
+    return f'rev-{manager.revision.current() if revision is None else revision}'
+
+def not_modified(etag):
+    """Réponse 304 vide si le client a déjà cette révision (rien n'est déchiffré), sinon None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(Response(status=304), etag)
+
+def with_etag(response, etag, secret=False):
+    """ETag et revalidation à chaque lecture ; les réponses avec des secrets ne sont pas gardées par le navigateur"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-store' if secret else 'private, no-cache'
+    return response
+
+# Templates compilés une seule fois ; sans variables, leur rendu (et ses versions compressées) est gardé
+PAGES = {
+    'login': app.jinja_env.from_string(LOGIN_HTML),
+    'main': app.jinja_env.from_string(MAIN_HTML)
+}
+_rendered_pages = {}  # (page, encodage ou None) -> octets
+
+def page_response(name):
+    """Page HTML depuis le cache, compressée selon l'Accept-Encoding du client"""
+    html = _rendered_pages.get((name, None))
+    if html is None:
+        html = _rendered_pages[(name, None)] = PAGES[name].render().encode('utf-8')
+    
+    encoding = negotiate(request.accept_encodings) if len(html) >= COMPRESS_MIN_SIZE else None
+    body = _rendered_pages.get((name, encoding))
+    if body is None:
+        body = _rendered_pages[(name, encoding)] = compress(html, encoding, best=True)
+    
+    response = Response(body, mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compresse les réponses (HTML, JSON...) au-delà de COMPRESS_MIN_SIZE, selon l'Accept-Encoding
+    
+    Jamais celles qui portent des secrets (no-store) : leur taille compressée, avec une
+    partie de la requête reflétée dans la réponse, suffit à les deviner (BREACH).
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'no-store' in response.cache_control):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    encoding = negotiate(request.accept_encodings) if len(data) >= COMPRESS_MIN_SIZE else None
+    if not encoding:
+        return response
+    
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # Le contenu encodé n'est plus identique octet pour octet : ETag faible
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+def static_file(filename):
+    """Fichiers statiques, dans leur version précompressée (.br, .gz) quand le client l'accepte"""
+    init_static_files()
+    if not filename.endswith(STATIC_SUFFIXES):
+        return app.send_static_file(filename)
+    
+    path = safe_join(app.static_folder, filename)
+    encoding = negotiate(request.accept_encodings)
+    compressed = precompressed(path, encoding) if path and encoding else None
+    if compressed:
+        response = send_from_directory(
+            app.static_folder, filename + SUFFIXES[encoding],
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = app.send_static_file(filename)
+    response.vary.add('Accept-Encoding')
+    return response
+
+app.view_functions['static'] = static_file
+
+def busy_response():
+    """Réponse rapide quand le pool KDF est saturé"""
+    response = jsonify({"success": False, "error": "Server busy, please retry"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 # Routes principales
 @app.route('/')
 def index():
@@ -693,10 +1181,7 @@ def index():
         # Initialiser les fichiers statiques dès la première requête
         init_static_files()
         
-        if session.get('authenticated'):
-            return render_template_string(MAIN_HTML)
-        else:
-            return render_template_string(LOGIN_HTML)
+        return page_response('main' if session.get('authenticated') else 'login')
     except Exception as e:
         print(f"Route error: {e}")
         return f"<h1>Error</h1><p>{str(e)}</p>", 500
@@ -704,6 +1189,10 @@ def index():
 @app.route('/api/auth', methods=['POST'])
 def authenticate():
     """API authentification"""
+    # Refus immédiat pendant une rafale de logins
+    if manager.kdf_pool.is_saturated():
+        return busy_response()
+    
     try:
         data = request.get_json()
         if not data:
@@ -716,33 +1205,88 @@ def authenticate():
         result = manager.authenticate(master_password)
         return jsonify(result)
         
+    except KDFPoolSaturated:
+        return busy_response()
     except Exception as e:
         print(f"Auth error: {e}")
         return jsonify({"success": False, "error": "Auth failed"})
 
+@app.route('/api/accounts', methods=['GET'])
+def get_accounts():
+    """Noms des comptes, sans déchiffrement"""
+    view = manager.get_view()
+    if not view:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    try:
+        etag = vault_etag()
+        return not_modified(etag) or with_etag(jsonify({"success": True, "accounts": view.accounts()}), etag)
+    except Exception as e:
+        print(f"Get accounts error: {e}")
+        return jsonify({"success": False, "error": "Load failed"})
+
+@app.route('/api/search', methods=['GET'])
+def search_passwords():
+    """Comptes correspondant à ?q= (nom, identifiant, URL) : seuls les candidats de l'index sont déchiffrés"""
+    view = manager.get_view()
+    if not view:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    try:
+        etag = vault_etag()
+        return not_modified(etag) or with_etag(jsonify({"success": True, "accounts": manager.search_index.search(view, request.args.get('q', ''))}), etag)
+    except Exception as e:
+        print(f"Search error: {e}")
+        return jsonify({"success": False, "error": "Search failed"})
+
 @app.route('/api/passwords', methods=['GET'])
 def get_passwords():
-    """GET passwords"""
+    """GET passwords (?account=... répété : seulement ces comptes ; ?fields=username : seulement ces champs)
+    
+    Avec ?limit=, ?cursor= ou ?q= : une page de comptes triés par nom, filtrés
+    par la recherche, et le curseur opaque de la page suivante.
+    """
     if not session.get('authenticated'):
         return jsonify({"success": False, "error": "Not authenticated"}), 401
     
     try:
-        crypto = manager.get_crypto()
-        if not crypto:
+        view = manager.get_view()
+        if not view:
             return jsonify({"success": False, "error": "Not authenticated"}), 401
-            
-        passwords = manager.load_passwords()
-        decrypted = {}
         
-        for account, encrypted in passwords.items():
+        # Coffre inchangé depuis la dernière lecture du client : 304, sans déchiffrement
+        revision = manager.revision.current()
+        etag = vault_etag(revision)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        accounts = request.args.getlist('account') or view.accounts()
+        fields = parse_fields(request.args.get('fields'))
+        secret = fields is None or any(field in SECRET_FIELDS for field in fields)
+        page = None
+        if any(name in request.args for name in ('limit', 'cursor', 'q')):
             try:
-                data = json.loads(crypto.decrypt(encrypted))
-                decrypted[account] = data
-            except Exception as e:
-                print(f"Decrypt error for {account}: {e}")
-                continue
+                limit = min(max(int(request.args.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+                accounts, next_cursor, total = manager.page_accounts(view, request.args.get('q', ''), limit, request.args.get('cursor'))
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            # Les clés JSON sont triées à l'envoi : l'ordre de la page est donné à part
+            page = {"accounts": accounts, "next_cursor": next_cursor, "total": total, "revision": revision}
+        
+        if fields == []:
+            # Noms seuls (?fields=account) : aucun déchiffrement
+            known = set(view.accounts())
+            return with_etag(jsonify({"success": True, "passwords": {account: {} for account in accounts if account in known}, "errors": [], **(page or {})}), etag)
+        
+        # Déchiffrement à la demande, via le cache d'entrées en clair de la session
+        decrypted, errors = view.get_many(accounts)
+        
+        for account, error in errors.items():
+            print(f"Decrypt error for {account}: {error}")
         
-        return jsonify({"success": True, "passwords": decrypted})
+        passwords = {account: project(data, fields) for account, data in decrypted.items()}
+        return with_etag(jsonify({"success": True, "passwords": passwords, "errors": list(errors), **(page or {})}), etag, secret)
         
     except Exception as e:
         print(f"Get passwords error: {e}")
@@ -770,8 +1314,6 @@ def save_password():
         crypto = manager.get_crypto()
         if not crypto:
             return jsonify({"success": False, "error": "Not authenticated"}), 401
-            
-        passwords = manager.load_passwords()
         
         password_data = {
             'username': username,
@@ -779,11 +1321,9 @@ def save_password():
             'notes': notes
         }
         
-        encrypted = crypto.encrypt(json.dumps(password_data))
-        passwords[account] = encrypted
+        encrypted = crypto.encrypt(json.dumps(password_data), account)
         
-        auth_token = crypto.encrypt("AUTH_VALID")
-        manager.save_database(auth_token, passwords)
+        manager.save_entry(account, encrypted, password_data)
         
         return jsonify({"success": True})
         
@@ -791,21 +1331,210 @@ def save_password():
         print(f"Save error: {e}")
         return jsonify({"success": False, "error": "Save failed"})
 
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """Entrées modifiées (upserts) et supprimées (deleted) depuis ?since=<révision>
+    
+    Sans since (ou avec une révision antérieure au suivi) : tout le coffre,
+    avec reset=true. ?fields= comme pour /api/passwords ; seules les entrées
+    modifiées sont déchiffrées.
+    """
+    view = manager.get_view()
+    if not view:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    try:
+        since = int(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid revision"}), 400
+    
+    try:
+        revision, changed, reset = manager.revision.changes(since)
+        etag = vault_etag(revision)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        upserted = [account for account, value in changed.items() if value is not None]
+        fields = parse_fields(request.args.get('fields'))
+        secret = fields is None or any(field in SECRET_FIELDS for field in fields)
+        if fields == []:
+            upserts, errors = {account: {} for account in upserted}, {}
+        else:
+            decrypted, errors = view.get_many(upserted)
+            upserts = {account: project(data, fields) for account, data in decrypted.items()}
+        
+        return with_etag(jsonify({
+            "success": True,
+            "revision": revision,
+            "reset": reset,
+            "upserts": upserts,
+            "deleted": [account for account, value in changed.items() if value is None],
+            "errors": list(errors)
+        }), etag, secret)
+        
+    except Exception as e:
+        print(f"Changes error: {e}")
+        return jsonify({"success": False, "error": "Load failed"})
+
+@app.route('/api/passwords/<path:account>', methods=['GET'])
+def get_password(account):
+    """Une seule entrée (?fields=... : seulement ces champs)"""
+    view = manager.get_view()
+    if not view:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    etag = vault_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    try:
+        data = view.get(account)
+    except EntryDecryptError as e:
+        print(f"Decrypt error for {e}")
+        return jsonify({"success": False, "error": "Entry could not be decrypted"}), 422
+    if data is None:
+        return jsonify({"success": False, "error": "Not found"}), 404
+    
+    fields = parse_fields(request.args.get('fields'))
+    secret = fields is None or any(field in SECRET_FIELDS for field in fields)
+    return with_etag(jsonify({"success": True, "account": account, "password": project(data, fields)}), etag, secret)
+
+@app.route('/api/passwords/<path:account>', methods=['PUT', 'PATCH'])
+def update_password(account):
+    """PUT : crée ou remplace l'entrée ; PATCH : modifie seulement les champs envoyés"""
+    view = manager.get_view()
+    if not view:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"success": False, "error": "No data"}), 400
+        
+        previous = view.store.get(account)
+        if request.method == 'PATCH':
+            if previous is None:
+                return jsonify({"success": False, "error": "Not found"}), 404
+            try:
+                current = view.get(account)
+            except EntryDecryptError as e:
+                print(f"Decrypt error for {e}")
+                return jsonify({"success": False, "error": "Entry could not be decrypted"}), 422
+            # Supprimée depuis la lecture : rien à modifier
+            if current is None:
+                return jsonify({"success": False, "error": "Not found"}), 404
+            password_data = {**current, **entry_from_json(data)}
+        else:
+            password_data = {'notes': '', **entry_from_json(data)}
+        
+        if not password_data.get('username') or not password_data.get('password'):
+            return jsonify({"success": False, "error": "Missing required fields"}), 400
+        
+        encrypted = view.crypto.encrypt(json.dumps(password_data), account)
+        # PATCH : lecture-modification-écriture, refusée si l'entrée a changé entre-temps
+        if not manager.save_entry(account, encrypted, password_data, previous if request.method == 'PATCH' else None):
+            return jsonify({"success": False, "error": "Entry changed, please retry"}), 409
+        
+        return jsonify({"success": True, "created": previous is None}), 201 if previous is None else 200
+        
+    except Exception as e:
+        print(f"Save error: {e}")
+        return jsonify({"success": False, "error": "Save failed"}), 500
+
+@app.route('/api/passwords/<path:account>', methods=['DELETE'])
+def delete_password(account):
+    """Supprime une entrée"""
+    if not manager.get_view():
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    try:
+        if not manager.delete_entry(account):
+            return jsonify({"success": False, "error": "Not found"}), 404
+        return jsonify({"success": True})
+    except Exception as e:
+        print(f"Delete error: {e}")
+        return jsonify({"success": False, "error": "Delete failed"}), 500
+
+@app.route('/api/change-master-password', methods=['POST'])
+def change_password():
+    """Change le master password"""
+    if not manager.get_crypto():
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "error": "No data"})
+        
+        current_password = data.get('current_password', '').strip()
+        new_password = data.get('new_password', '').strip()
+        if not current_password or not new_password:
+            return jsonify({"success": False, "error": "Password required"})
+        
+        return jsonify(manager.change_master_password(current_password, new_password))
+        
+    except KDFPoolSaturated:
+        return busy_response()
+    except Exception as e:
+        print(f"Change password error: {e}")
+        return jsonify({"success": False, "error": "Change failed"})
+
 @app.route('/api/generate-password')
 def generate_password():
     """Generate password"""
     try:
         password = manager.generate_password()
-        return jsonify({"success": True, "password": password})
+        response = jsonify({"success": True, "password": password})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
+@app.route('/api/scrub', methods=['POST'])
+def start_scrub():
+    """Vérifie chaque entrée du coffre en arrière-plan ({"incremental": true} : seulement les entrées modifiées)"""
+    crypto = manager.get_crypto()
+    if not crypto:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    if not manager.start_scrub(crypto, bool(data.get('incremental'))):
+        return jsonify({"success": False, "error": "Scrub already running", "scrub": manager.scrub_progress()}), 409
+    return jsonify({"success": True, "scrub": manager.scrub_progress()}), 202
+
+@app.route('/api/scrub', methods=['GET'])
+def scrub_status():
+    """Progression de la vérification (comptes corrompus ou indéchiffrables)"""
+    if not manager.get_view():
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    return jsonify({"success": True, "scrub": manager.scrub_progress()})
+
 @app.route('/api/logout', methods=['POST'])
 def logout():
     """Logout"""
-    session.clear()
+    manager.close_session()
     return jsonify({"success": True})
 
+@app.route('/api/stats')
+def stats():
+    """Statistiques internes (cache de clés, pool KDF, stockage, entrées en clair, index de recherche et des comptes, révision)"""
+    if not manager.get_view():
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    
+    return jsonify({
+        "success": True,
+        "key_cache": manager.key_cache.stats(),
+        "kdf_pool": manager.kdf_pool.stats(),
+        "storage": manager.store.stats(),
+        "plaintext_cache": manager.get_view().stats(),
+        "search_index": manager.search_index.stats(),
+        "account_index": manager.account_index.stats(),
+        "revision": manager.revision.stats()
+    })
+
 @app.route('/static/manifest.json')
 def manifest():
     """Serve manifest.json"""